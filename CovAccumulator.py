@@ -0,0 +1,552 @@
+import io
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+
+def get_csv_byte_ranges(path, num_shards):
+    """
+    This function splits the csv file at 'path' into 'num_shards' shards,
+    and returns the byte range [start, end) of each shard. The first line
+    (the column labels) is not included in any shard, and every shard
+    starts at the beginning of a line and ends at the end of a line.
+    Some shards may be empty if the file has few lines.
+
+    Parameters
+    ----------
+    path: str
+    num_shards: int
+
+    Returns
+    -------
+    list[tuple[int, int]]
+
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.readline()
+        header_end = f.tell()
+        boundaries = [header_end]
+        for k in range(1, num_shards):
+            pos = header_end + k * (size - header_end) // num_shards
+            pos = max(pos, boundaries[-1])
+            if pos > header_end:
+                # move to the beginning of the next line
+                f.seek(pos - 1)
+                f.readline()
+                pos = f.tell()
+            boundaries.append(pos)
+        boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def accumulate_csv_range(args):
+    """
+    This function returns the state (see CovAccumulator.to_dict()) of a
+    CovAccumulator that has ingested the rows of the csv file 'path' that
+    are in the byte range [start, end). The range is read in blocks of
+    about 'block_bytes' bytes, so only one block is in memory at a time.
+
+    It is defined at module level so that it can be pickled and sent to
+    the worker processes of a process pool.
+
+    Parameters
+    ----------
+    args: tuple
+        (path, columns, start, end, block_bytes)
+
+    Returns
+    -------
+    dict
+
+    """
+    path, columns, start, end, block_bytes = args
+    acc = CovAccumulator(columns)
+    # the labels are parsed by pandas, like the rows (quotes, spaces, etc.)
+    file_columns = list(pd.read_csv(path, nrows=0).columns)
+    with open(path, "rb") as f:
+        pos = start
+        f.seek(pos)
+        while pos < end:
+            block = f.read(min(block_bytes, end - pos))
+            if f.tell() < end and not block.endswith(b"\n"):
+                # finish the last line of the block
+                block += f.readline()
+            pos = f.tell()
+            df = pd.read_csv(io.BytesIO(block), header=None,
+                             names=file_columns)
+            acc.ingest_df(df)
+    return acc.to_dict()
+
+
+class CovAccumulator:
+    """
+    The purpose of this class is to calculate the covariance matrix of a
+    dataset that is streamed in chunks (for example, a csv file that is too
+    big to fit in memory, or data that is still arriving), without ever
+    holding the whole dataset in memory.
+
+    It stores the sufficient statistics of the rows seen so far: their
+    number, their mean, and their co-moment matrix
+
+    comoment[i, j] = sum over rows of (x_i - mean_i)(x_j - mean_j)
+
+    Each new chunk is summarized in the same way and then merged with the
+    stored statistics using the pairwise update of Chan et al. (a
+    generalization of Welford's algorithm to chunks), which is numerically
+    stable. Two accumulators over disjoint parts of a dataset can be
+    merged in the same way, giving the same result as a single
+    accumulator over the whole dataset.
+
+    The covariance matrix returned by get_cov_mat() can be fed directly to
+    GainsEstimator(graph, None, cov_mat_nm=...).
+
+    Attributes
+    ----------
+    columns: list[str]
+        column labels, in the order used for the rows and columns of mean
+        and comoment. If the accumulator is used to estimate gains,
+        this should be graph.ord_nodes.
+    comoment: np.array of shape=(dim, dim)
+    mean: np.array of shape=(dim,)
+    num_rows: int
+        number of rows seen so far
+
+    """
+
+    def __init__(self, columns):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        columns: list[str]
+        """
+        self.columns = list(columns)
+        dim = len(self.columns)
+        self.num_rows = 0
+        self.mean = np.zeros(dim)
+        self.comoment = np.zeros((dim, dim))
+
+    def merge_stats(self, num_rows, mean, comoment):
+        """
+        This method merges the sufficient statistics (num_rows, mean,
+        comoment) of another set of rows into the statistics stored in self.
+
+        Parameters
+        ----------
+        num_rows: int
+        mean: np.array of shape=(dim,)
+        comoment: np.array of shape=(dim, dim)
+
+        Returns
+        -------
+        None
+
+        """
+        if num_rows == 0:
+            return
+        total = self.num_rows + num_rows
+        delta = mean - self.mean
+        self.comoment = self.comoment + comoment + \
+            np.outer(delta, delta) * (self.num_rows * num_rows / total)
+        self.mean = self.mean + delta * (num_rows / total)
+        self.num_rows = total
+
+    def update(self, data):
+        """
+        This method ingests the rows of 'data'.
+
+        Parameters
+        ----------
+        data: np.array of shape=(num_rows, dim)
+            columns in the order of self.columns
+
+        Returns
+        -------
+        None
+
+        """
+        data = np.asarray(data, dtype=float)
+        assert data.ndim == 2 and data.shape[1] == len(self.columns)
+        num_rows = data.shape[0]
+        if num_rows == 0:
+            return
+        mean = data.mean(axis=0)
+        centered = data - mean
+        self.merge_stats(num_rows, mean, centered.T @ centered)
+
+    def merge(self, other):
+        """
+        This method merges into self the statistics of the CovAccumulator
+        'other', which must have the same columns as self.
+
+        Parameters
+        ----------
+        other: CovAccumulator
+
+        Returns
+        -------
+        None
+
+        """
+        assert other.columns == self.columns
+        self.merge_stats(other.num_rows, other.mean, other.comoment)
+
+    def ingest_df(self, df):
+        """
+        This method ingests the rows of the dataframe 'df'. The columns of
+        df need not be in the order of self.columns.
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+
+        Returns
+        -------
+        None
+
+        """
+        self.update(df[self.columns].to_numpy(dtype=float))
+
+    def ingest_csv(self, path, chunksize=100000):
+        """
+        This method ingests the csv file at 'path', reading it in chunks of
+        'chunksize' rows, so that only one chunk is in memory at a time.
+
+        Parameters
+        ----------
+        path: str
+        chunksize: int
+
+        Returns
+        -------
+        None
+
+        """
+        for df in pd.read_csv(path, chunksize=chunksize):
+            self.ingest_df(df)
+
+    def ingest_permuted(self, other, file_columns):
+        """
+        This method merges into self the statistics of the CovAccumulator
+        'other', whose columns 'file_columns' are a superset of
+        self.columns, in any order. The statistics of other are permuted
+        (and restricted) to the order of self.columns first.
+
+        Parameters
+        ----------
+        other: CovAccumulator
+        file_columns: list[str]
+
+        Returns
+        -------
+        None
+
+        """
+        index = [file_columns.index(col) for col in self.columns]
+        self.merge_stats(other.num_rows,
+                         other.mean[index],
+                         other.comoment[np.ix_(index, index)])
+
+    def ingest_npy(self, path, file_columns=None, chunk_rows=100000):
+        """
+        This method ingests the .npy file at 'path', which must contain a
+        2-dim array of shape=(num_rows, num_columns). The file is memory
+        mapped, and read in chunks of 'chunk_rows' contiguous rows,
+        so only the pages of one chunk are in memory at a time and the
+        columns are never copied into a new order. The statistics are
+        accumulated in the order of the file, and permuted to the order of
+        self.columns at the end.
+
+        Parameters
+        ----------
+        path: str
+        file_columns: None or list[str]
+            labels of the columns of the array in the file. If None,
+            they are assumed to be self.columns.
+        chunk_rows: int
+
+        Returns
+        -------
+        None
+
+        """
+        if file_columns is None:
+            file_columns = self.columns
+        data = np.load(path, mmap_mode="r")
+        assert data.ndim == 2 and data.shape[1] == len(file_columns)
+        file_acc = CovAccumulator(file_columns)
+        for start in range(0, data.shape[0], chunk_rows):
+            file_acc.update(data[start: start + chunk_rows])
+        self.ingest_permuted(file_acc, list(file_columns))
+
+    def ingest_parquet(self, path, chunk_rows=100000):
+        """
+        This method ingests the Apache Parquet file at 'path', in batches
+        of 'chunk_rows' rows. The columns of the file must be those in
+        self.columns, in any order. Requires pyarrow.
+
+        Parameters
+        ----------
+        path: str
+        chunk_rows: int
+
+        Returns
+        -------
+        None
+
+        """
+        import pyarrow.parquet as pq
+        pq_file = pq.ParquetFile(path)
+        assert set(pq_file.schema_arrow.names) == set(self.columns)
+        for batch in pq_file.iter_batches(batch_size=chunk_rows,
+                                          columns=self.columns):
+            self.update(np.column_stack(
+                [batch.column(i).to_numpy(zero_copy_only=False) for i in
+                 range(batch.num_columns)]))
+
+    def ingest_arrow(self, path):
+        """
+        This method ingests the Arrow IPC (a.k.a. Feather v2) file at
+        'path'. The file is memory mapped and read one record batch at a
+        time. The columns of the file must be those in self.columns,
+        in any order. Requires pyarrow.
+
+        Parameters
+        ----------
+        path: str
+
+        Returns
+        -------
+        None
+
+        """
+        import pyarrow as pa
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            assert set(reader.schema.names) == set(self.columns)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                self.update(np.column_stack(
+                    [batch.column(col).to_numpy(zero_copy_only=False) for col in
+                     self.columns]))
+
+    def ingest_file(self, path, file_columns=None, chunk_rows=100000):
+        """
+        This method ingests the file at 'path'. The format of the file is
+        inferred from its extension: ".csv", ".npy", ".parquet",
+        or ".arrow"/".feather".
+
+        Parameters
+        ----------
+        path: str
+        file_columns: None or list[str]
+            only used for .npy files. See ingest_npy()
+        chunk_rows: int
+
+        Returns
+        -------
+        None
+
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".csv":
+            self.ingest_csv(path, chunksize=chunk_rows)
+        elif ext == ".npy":
+            self.ingest_npy(path, file_columns, chunk_rows=chunk_rows)
+        elif ext == ".parquet":
+            self.ingest_parquet(path, chunk_rows=chunk_rows)
+        elif ext in [".arrow", ".feather"]:
+            self.ingest_arrow(path)
+        else:
+            assert False, "unsupported file extension: " + ext
+
+    def to_dict(self):
+        """
+        This method returns the state of self as a dictionary of plain
+        python and numpy objects, which can be pickled (for example,
+        to send it from a worker process to a coordinator). from_dict()
+        is its inverse.
+
+        Returns
+        -------
+        dict
+
+        """
+        return {"columns": list(self.columns),
+                "num_rows": self.num_rows,
+                "mean": self.mean.copy(),
+                "comoment": self.comoment.copy()}
+
+    @staticmethod
+    def from_dict(state):
+        """
+        This method returns a CovAccumulator with the state 'state'
+        returned by to_dict().
+
+        Parameters
+        ----------
+        state: dict
+
+        Returns
+        -------
+        CovAccumulator
+
+        """
+        acc = CovAccumulator(state["columns"])
+        acc.num_rows = int(state["num_rows"])
+        acc.mean = np.array(state["mean"], dtype=float)
+        acc.comoment = np.array(state["comoment"], dtype=float)
+        return acc
+
+    def save(self, path):
+        """
+        This method stores the state of self in the .npz file at 'path'.
+
+        Parameters
+        ----------
+        path: str
+
+        Returns
+        -------
+        None
+
+        """
+        np.savez(path,
+                 columns=np.array(self.columns),
+                 num_rows=self.num_rows,
+                 mean=self.mean,
+                 comoment=self.comoment)
+
+    @staticmethod
+    def load(path):
+        """
+        This method returns the CovAccumulator stored by save() in the
+        .npz file at 'path'.
+
+        Parameters
+        ----------
+        path: str
+
+        Returns
+        -------
+        CovAccumulator
+
+        """
+        with np.load(path) as data:
+            state = {"columns": [str(x) for x in data["columns"]],
+                     "num_rows": data["num_rows"],
+                     "mean": data["mean"],
+                     "comoment": data["comoment"]}
+        return CovAccumulator.from_dict(state)
+
+    @staticmethod
+    def from_csv_parallel(path, columns, num_workers=None,
+                          block_bytes=2**24):
+        """
+        This method returns a CovAccumulator that has ingested the whole
+        csv file at 'path'. The file is split into one shard (byte range)
+        per worker, each worker process summarizes its shard with
+        accumulate_csv_range(), and the partial statistics are then merged.
+
+        Parameters
+        ----------
+        path: str
+        columns: list[str]
+        num_workers: int or None
+            number of worker processes. If None, all the cores are used.
+        block_bytes: int
+            approximate number of bytes read at a time by each worker
+
+        Returns
+        -------
+        CovAccumulator
+
+        """
+        if num_workers is None:
+            num_workers = os.cpu_count()
+        args_list = [(path, list(columns), start, end, block_bytes) for
+                     start, end in get_csv_byte_ranges(path, num_workers)]
+        acc = CovAccumulator(columns)
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            for state in executor.map(accumulate_csv_range, args_list):
+                acc.merge(CovAccumulator.from_dict(state))
+        return acc
+
+    def get_cov_mat(self, ddof=1):
+        """
+        This method returns the covariance matrix of all the rows seen so
+        far. With ddof=1 (the default), it agrees with pd.DataFrame.cov().
+
+        Parameters
+        ----------
+        ddof: int
+            delta degrees of freedom. The divisor is num_rows - ddof
+
+        Returns
+        -------
+        np.array of shape=(dim, dim)
+
+        """
+        assert self.num_rows > ddof
+        return self.comoment / (self.num_rows - ddof)
+
+
+if __name__ == "__main__":
+    from GainsEstimator import *
+
+    def main():
+        path = 'dot_atlas/good_bad_trols_G1.dot'
+        graph = Graph(path)
+        dim = graph.num_nds
+        dmaker = RandomDataMaker(graph,
+                                 mean_eps=[0]*dim,
+                                 sig_eps=[10]*dim,
+                                 alpha_bound=10)
+        data_path = "test_data.csv"
+        dmaker.write_dataset_csv(10000, data_path)
+
+        acc = CovAccumulator(graph.ord_nodes)
+        acc.ingest_csv(data_path, chunksize=1000)
+        df = pd.read_csv(data_path)[graph.ord_nodes]
+        print("max |acc cov - df.cov()|=",
+              np.max(np.abs(acc.get_cov_mat() - df.cov().to_numpy())))
+
+        # new data arrives
+        acc.update(dmaker.generate_random_instances(5000))
+        gest = GainsEstimator(graph, None, cov_mat_nm=acc.get_cov_mat())
+        print("num_rows=", acc.num_rows)
+        print("alpha_mat_estimate=\n", gest.alpha_mat_estimate)
+        print("true alpha_mat=\n", dmaker.alpha_mat)
+
+        # the state survives a round trip to disk
+        acc.save("tempo_acc.npz")
+        acc1 = CovAccumulator.load("tempo_acc.npz")
+        print("loaded state equal=", acc1.num_rows == acc.num_rows and
+              np.allclose(acc1.comoment, acc.comoment))
+        os.remove("tempo_acc.npz")
+
+        # benchmark: single process vs sharded multi-process
+        from time import time
+        big_path = "test_data_big.csv"
+        dmaker.write_dataset_in_chunks(2000000, big_path, verbose=False)
+        start = time()
+        acc = CovAccumulator(graph.ord_nodes)
+        acc.ingest_csv(big_path)
+        print("single process: %.2f s" % (time() - start))
+        for num_workers in [1, os.cpu_count()]:
+            start = time()
+            acc_par = CovAccumulator.from_csv_parallel(
+                big_path, graph.ord_nodes, num_workers=num_workers)
+            print("%d processes: %.2f s" % (num_workers, time() - start))
+        print("num_rows=", acc_par.num_rows,
+              ", max |difference of covs|=",
+              np.max(np.abs(acc.get_cov_mat() - acc_par.get_cov_mat())))
+        gest = GainsEstimator(graph, None,
+                              cov_mat_nm=acc_par.get_cov_mat())
+        print("alpha_mat_estimate=\n", gest.alpha_mat_estimate)
+        os.remove(big_path)
+
+    main()
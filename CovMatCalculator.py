@@ -1,5 +1,7 @@
 from core_matrices import *
 from numerical_subs import *
+from SymbolicCache import *
+from simplification import *
 from copy import deepcopy
 
 
@@ -19,21 +21,56 @@ class CovMatCalculator:
     on a collider, this can introduce a non-blocked path between \epsilon_i
     and \epsilon_j.
 
+    Single entries of C and J can be requested lazily with get_cov() and
+    get_pder(). Only the requested entries are calculated, and they are
+    memoized. calculate_cov_mat() calculates all the entries of C and J.
+
     Attributes
     ----------
+    cache: None or SymbolicCache
+        If not None, the results of calculate_cov_mat() are stored in,
+        and read from, this on-disk cache.
     conditioned_nds: list[str]
         List of the nodes that we want to condition on
     cov_mat_sb: sp.Matrix
         an sp.Matrix for the covariance matrix C.
+    cov_memo: dict[(int, int), sp.Expr]
+        memoized entries of C, keyed by (row, col)
+    eps_cov_mat: sp.Matrix
+        the covariance matrix ee of the external nodes. See
+        get_eps_cov_mat()
     graph: Graph
+    inv_method: str
+        Either "sympy" or "triangular". If inv_method="sympy", (1-A).inv()
+        is calculated by sympy's generic matrix inversion. If
+        inv_method="triangular", (1-A).inv() is calculated by forward
+        substitution (see get_one_minus_A_inv_triangular()), which is much
+        faster for large graphs.
     jacobian_sb: sp.Matrix
         an sp.Matrix for the Jacobian matrix J.
     one_minus_A_inv_sb: sp.Matrix
         (1-A).inv(), where A is the matrix of gains \alpha_{i|j}
+    pder_memo: dict[(int, int), sp.Expr]
+        memoized entries of J, keyed by (row, col)
+    simp_policy: str
+        simplification policy for the entries of C and J (see
+        simplification.py): "none", "cancel", "factor" or "simplify"
+    simp_timeout: None or float
+        timeout in seconds for the simplification of each entry
+    timed_out: bool
+        True iff the simplification of some entry timed out. If so,
+        calculate_cov_mat() does not store its results in the cache.
+    timed_out_memo: dict[(str, int, int), sp.Expr]
+        entries of C and J whose simplification timed out, unsimplified,
+        keyed by ("cov", row, col) or ("pder", row, col). They are kept
+        apart from cov_memo and pder_memo, and are never cached on disk,
+        but they are reused, so that each entry times out at most once.
 
     """
 
-    def __init__(self, graph, conditioned_nds=None):
+    def __init__(self, graph, conditioned_nds=None, cache=None,
+                 inv_method="sympy", simp_policy=None,
+                 simp_timeout="default"):
         """
         Constructor
 
@@ -42,6 +79,17 @@ class CovMatCalculator:
         graph: Graph
         conditioned_nds: None or list[str]
             Nodes that are being conditioned on (a.k.a the "controls")
+        cache: None or SymbolicCache
+            If None, SymbolicCache.get_default() is used.
+        inv_method: str
+            Either "sympy" or "triangular"
+        simp_policy: None or str
+            If None, it is "none" if inv_method="triangular", and the
+            default policy of simplification.py (initially "simplify")
+            otherwise.
+        simp_timeout: "default" or None or float
+            If "default", the default timeout of simplification.py is used.
+            If None, there is no timeout.
         """
         self.graph = graph
         if conditioned_nds is None:
@@ -50,9 +98,228 @@ class CovMatCalculator:
             assert set(conditioned_nds).issubset(graph.ord_nodes)
             self.conditioned_nds = conditioned_nds
 
+        assert inv_method in ["sympy", "triangular"], inv_method
+        self.inv_method = inv_method
+        default_policy, default_timeout = get_default_simp_policy()
+        if simp_policy is None:
+            if inv_method == "triangular":
+                simp_policy = "none"
+            else:
+                simp_policy = default_policy
+        assert simp_policy in SIMP_POLICIES, simp_policy
+        self.simp_policy = simp_policy
+        if simp_timeout == "default":
+            simp_timeout = default_timeout
+        self.simp_timeout = simp_timeout
+        self.timed_out = False
+
         self.cov_mat_sb = None
         self.jacobian_sb = None
         self.one_minus_A_inv_sb = None
+        self.eps_cov_mat = None
+        self.cov_memo = {}
+        self.pder_memo = {}
+        self.timed_out_memo = {}
+        if cache is None:
+            cache = SymbolicCache.get_default()
+        self.cache = cache
+
+    @staticmethod
+    def get_one_minus_A_inv_triangular(mat_A):
+        """
+        This method returns (1-A).inv() for a strictly lower triangular
+        matrix A (the gains \alpha_{i|j} with the nodes in topological
+        order). It uses forward substitution instead of a generic matrix
+        inversion. If M = (1-A).inv(), then M = 1 + A M, so
+
+        M_{i, i} = 1
+
+        M_{i, j} = sum_{k: j<=k<i, A_{i,k}!=0} A_{i, k} M_{k, j} for i>j
+
+        M_{i, j} = 0 for i<j
+
+        Only the nonzero gains (i.e., the arrows of the graph) are
+        visited. M_{i,j} is the sum, over all directed paths from x_j to
+        x_i, of the product of the gains along the path, and it is returned
+        in factored (not expanded) form.
+
+        Parameters
+        ----------
+        mat_A: sp.Matrix
+            strictly lower triangular
+
+        Returns
+        -------
+        sp.Matrix
+
+        """
+        dim = mat_A.shape[0]
+        one_minus_A_inv = sp.eye(dim)
+        for row in range(1, dim):
+            pa_list = [k for k in range(row) if mat_A[row, k] != 0]
+            for col in range(row):
+                one_minus_A_inv[row, col] = sp.Add(
+                    *[mat_A[row, k]*one_minus_A_inv[k, col]
+                      for k in pa_list if k >= col])
+        return one_minus_A_inv
+
+    def get_eps_cov_mat(self):
+        """
+        This method returns the covariance matrix ee of the external
+        nodes, with entries ee_i_j = <eps_i, eps_j>. If
+        self.conditioned_nds is empty, ee is diagonal. Otherwise,
+        <eps_i, eps_j> = 0 iff x_i or x_j is a conditioned node.
+
+        Returns
+        -------
+        sp.Matrix
+
+        """
+        dim = self.graph.num_nds
+        eps_cov = ee_sb_mat(dim)
+        for row, col in product(range(dim), range(dim)):
+            row_nd = self.graph.ord_nodes[row]
+            col_nd = self.graph.ord_nodes[col]
+            if len(self.conditioned_nds) == 0:
+                if row_nd != col_nd:
+                    eps_cov[row, col] = 0
+            else:
+                if (row_nd in self.conditioned_nds or
+                        col_nd in self.conditioned_nds):
+                    eps_cov[row, col] = 0
+        return eps_cov
+
+    def get_one_minus_A_inv(self):
+        """
+        This method returns (1-A).inv(), where A is the strictly lower
+        diagonal matrix of gains \alpha_{i|j}. It is calculated the first
+        time this method is called, and stored in self.one_minus_A_inv_sb.
+
+        Returns
+        -------
+        sp.Matrix
+
+        """
+        if self.one_minus_A_inv_sb is None:
+            dim = self.graph.num_nds
+            mat_A = alpha_sb_mat_from_graph(self.graph)
+            if self.inv_method == "triangular":
+                self.one_minus_A_inv_sb = \
+                    CovMatCalculator.get_one_minus_A_inv_triangular(mat_A)
+            else:
+                one_minus_A = sp.eye(dim) - mat_A
+                self.one_minus_A_inv_sb = one_minus_A.inv()
+        return self.one_minus_A_inv_sb
+
+    def get_cov_entry(self, row, col):
+        """
+        This method returns the entry C_{row, col} of the covariance matrix
+        C = (1-A).inv() ee (1-A).inv().T, where ee = self.eps_cov_mat.
+        The entry is memoized.
+
+        Parameters
+        ----------
+        row: int
+        col: int
+
+        Returns
+        -------
+        sp.Expr
+
+        """
+        if self.cov_mat_sb is not None:
+            return self.cov_mat_sb[row, col]
+        # C is symmetric, but C_{row, col} and C_{col, row} are simplified
+        # separately, because sympy may simplify them to different (but
+        # equal) forms, and calculate_cov_mat() must print as before
+        key = (row, col)
+        if ("cov", row, col) in self.timed_out_memo:
+            return self.timed_out_memo[("cov", row, col)]
+        if key not in self.cov_memo:
+            if self.eps_cov_mat is None:
+                self.eps_cov_mat = self.get_eps_cov_mat()
+            one_minus_A_inv = self.get_one_minus_A_inv()
+            cov = (one_minus_A_inv[row, :] * self.eps_cov_mat *
+                   one_minus_A_inv[col, :].T)[0, 0]
+            cov, timed_out = simplify_expr(cov, self.simp_policy,
+                                           self.simp_timeout)
+            if timed_out:
+                self.timed_out = True
+                self.timed_out_memo[("cov", row, col)] = cov
+                return cov
+            self.cov_memo[key] = cov
+        return self.cov_memo[key]
+
+    def get_pder_entry(self, row, col):
+        """
+        This method returns the entry J_{row, col} = C_{row, col}/C_{col,
+        col} of the Jacobian matrix J. The entry is memoized.
+
+        Parameters
+        ----------
+        row: int
+        col: int
+
+        Returns
+        -------
+        sp.Expr
+
+        """
+        if self.jacobian_sb is not None:
+            return self.jacobian_sb[row, col]
+        key = (row, col)
+        if ("pder", row, col) in self.timed_out_memo:
+            return self.timed_out_memo[("pder", row, col)]
+        if key not in self.pder_memo:
+            pder = self.get_cov_entry(row, col) / \
+                self.get_cov_entry(col, col)
+            pder, timed_out = simplify_expr(pder, self.simp_policy,
+                                            self.simp_timeout)
+            if timed_out:
+                self.timed_out = True
+                self.timed_out_memo[("pder", row, col)] = pder
+                return pder
+            self.pder_memo[key] = pder
+        return self.pder_memo[key]
+
+    def get_cov(self, row_nd, col_nd):
+        """
+        This method returns <row_nd, col_nd>, the entry of the covariance
+        matrix C for the nodes named 'row_nd' and 'col_nd'. Only this entry
+        is calculated, not the full matrix C.
+
+        Parameters
+        ----------
+        row_nd: str
+        col_nd: str
+
+        Returns
+        -------
+        sp.Expr
+
+        """
+        return self.get_cov_entry(self.graph.node_position(row_nd),
+                                  self.graph.node_position(col_nd))
+
+    def get_pder(self, row_nd, col_nd):
+        """
+        This method returns the entry of the Jacobian matrix J for the
+        nodes named 'row_nd' and 'col_nd', i.e., the partial derivative of
+        row_nd with respect to col_nd. Only the entries of C that are
+        needed are calculated, not the full matrices C and J.
+
+        Parameters
+        ----------
+        row_nd: str
+        col_nd: str
+
+        Returns
+        -------
+        sp.Expr
+
+        """
+        return self.get_pder_entry(self.graph.node_position(row_nd),
+                                   self.graph.node_position(col_nd))
 
     def calculate_cov_mat(self):
         """
@@ -73,32 +340,33 @@ class CovMatCalculator:
         None
 
         """
-        dim = self.graph.num_nds
-        mat_A = set_to_zero_gains_without_arrows(self.graph,
-                                             alpha_sb_mat(dim))
-        one_minus_A = sp.eye(dim) - mat_A
-        self.one_minus_A_inv_sb = one_minus_A.inv()
+        if self.cov_mat_sb is not None:
+            return
+        key = None
+        if self.cache is not None:
+            key = SymbolicCache.get_key("cov_mat", self.graph,
+                                        conditioned_nds=self.conditioned_nds,
+                                        inv_method=self.inv_method,
+                                        simp_policy=self.simp_policy,
+                                        engine=type(self).__name__)
+            cached = self.cache.load(key)
+            if cached is not None:
+                self.cov_mat_sb, self.jacobian_sb, self.one_minus_A_inv_sb = \
+                    cached
+                return
 
-        eps_cov = ee_sb_mat(dim)
-        for row, col in product(range(dim), range(dim)):
-            row_nd = self.graph.ord_nodes[row]
-            col_nd = self.graph.ord_nodes[col]
-            if len(self.conditioned_nds) == 0:
-                if row_nd != col_nd:
-                    eps_cov = eps_cov.subs(eps_cov[row, col], 0)
-            else:
-                if (row_nd in self.conditioned_nds or
-                        col_nd in self.conditioned_nds):
-                    eps_cov = eps_cov.subs(eps_cov[row, col], 0)
-
-        cov_mat = sp.simplify(self.one_minus_A_inv_sb * eps_cov *
-                              self.one_minus_A_inv_sb.T)
-        sigma_nd_sq_inv = sp.zeros(dim)
-        for i in range(dim):
-            sigma_nd_sq_inv[i, i] = 1 / cov_mat[i, i]
-        jacobian = sp.simplify(cov_mat * sigma_nd_sq_inv)
+        dim = self.graph.num_nds
+        self.get_one_minus_A_inv()
+        cov_mat = sp.Matrix(dim, dim,
+                            lambda i, j: self.get_cov_entry(i, j))
+        jacobian = sp.Matrix(dim, dim,
+                             lambda i, j: self.get_pder_entry(i, j))
         self.cov_mat_sb = cov_mat
         self.jacobian_sb = jacobian
+        if self.cache is not None and not self.timed_out:
+            self.cache.save(key, (self.cov_mat_sb,
+                                  self.jacobian_sb,
+                                  self.one_minus_A_inv_sb))
 
     def print_cov_mat(self, verbose=False, time=None):
         """
@@ -172,6 +440,8 @@ if __name__ == "__main__":
         graph = Graph(path)
         cal = CovMatCalculator(graph,
                                conditioned_nds=conditioned_nds)
+        print("<X, Y>=", cal.get_cov("X", "Y"))
+        print("pder Y wrt X=", cal.get_pder("Y", "X"))
         cal.calculate_cov_mat()
         cal.print_cov_mat(verbose=True)
         cal.print_jacobian(verbose=True)
@@ -33,7 +33,9 @@ class FBackCovMatCalculator(CovMatCalculator):
 
     """
 
-    def __init__(self, graph, conditioned_nds=None):
+    def __init__(self, graph, conditioned_nds=None, cache=None,
+                 inv_method="sympy", simp_policy=None,
+                 simp_timeout="default"):
         """
         Constructor
 
@@ -41,8 +43,18 @@ class FBackCovMatCalculator(CovMatCalculator):
         ----------
         graph: FBackGraph
         conditioned_nds: list[str]
+        cache: None or SymbolicCache
+        inv_method: str
+        simp_policy: None or str
+            also used for the growth matrix G
+        simp_timeout: "default" or None or float
         """
-        CovMatCalculator.__init__(self, graph, conditioned_nds=conditioned_nds)
+        CovMatCalculator.__init__(self, graph,
+                                  conditioned_nds=conditioned_nds,
+                                  cache=cache,
+                                  inv_method=inv_method,
+                                  simp_policy=simp_policy,
+                                  simp_timeout=simp_timeout)
         self.growth_mat_sb = None
 
     def calculate_cov_mat(self):
@@ -56,11 +68,25 @@ class FBackCovMatCalculator(CovMatCalculator):
         None
 
         """
-        dim = self.graph.num_nds
         CovMatCalculator.calculate_cov_mat(self)
-        mat_B = set_to_zero_fback_gains_without_arrows(self.graph,
-                                             beta_sb_mat(dim))
-        self.growth_mat_sb = sp.simplify(self.one_minus_A_inv_sb*mat_B)
+        key = None
+        if self.cache is not None:
+            key = SymbolicCache.get_key("growth_mat", self.graph,
+                                        conditioned_nds=self.conditioned_nds,
+                                        inv_method=self.inv_method,
+                                        simp_policy=self.simp_policy)
+            self.growth_mat_sb = self.cache.load(key)
+            if self.growth_mat_sb is not None:
+                return
+        mat_B = beta_sb_mat_from_graph(self.graph)
+        self.growth_mat_sb = self.one_minus_A_inv_sb*mat_B
+        self.growth_mat_sb, timed_out = simplify_expr(self.growth_mat_sb,
+                                                      self.simp_policy,
+                                                      self.simp_timeout)
+        if timed_out:
+            self.timed_out = True
+        if self.cache is not None and not self.timed_out:
+            self.cache.save(key, self.growth_mat_sb)
 
     def print_cov_mat(self, verbose=False, time=None):
         """
@@ -1,7 +1,28 @@
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from FBackGainsEstimator import *
 
 
+def make_fback_estimator(args):
+    """
+    This function returns FBackGainsEstimator(*args). It is defined at
+    module level (instead of as a method of FBackGEmanager) so that it can
+    be pickled and sent to the worker processes of a process pool.
+
+    Parameters
+    ----------
+    args: tuple
+        (time, graph, df, solve_symbolically, hidden_nds, delta,
+        generic_calc, cov_mat_list_nm)
+
+    Returns
+    -------
+    FBackGainsEstimator
+
+    """
+    return FBackGainsEstimator(*args)
+
+
 class FBackGEmanager:
     """
     GE=Gains Estimator. The goal of this class is to create an
@@ -17,9 +38,21 @@ class FBackGEmanager:
         average over time-slices of alpha_mat
     mean_beta_mat: np.array
         average over time-slices of beta_mat
+    n_jobs: int or None
+        number of worker processes used to construct the estimators of
+        the time slices. n_jobs=1 constructs them sequentially, in the
+        current process. n_jobs=None uses all the cores.
     n_max: int
         >=1
     n_to_estimator: dict[int, FBackGainsEstimator]
+    solve_once: bool
+        Only used if solve_symbolically=True. If True, the system of
+        equations is solved symbolically only once, at the generic time "n"
+        (see FBackGainsEstimator.get_generic_calc()), and that solution is
+        evaluated numerically for each time slice. If False, each time
+        slice solves its own system of equations. If
+        solve_symbolically=False, each time slice solves its own system
+        of equations numerically, and solve_once is ignored.
     solve_symbolically: bool
         same meaning as in FBackGainsEstimator
     std_of_alpha_mat: np.array
@@ -34,7 +67,9 @@ class FBackGEmanager:
                  path,
                  solve_symbolically=False,
                  hidden_nds=None,
-                 delta=True):
+                 delta=True,
+                 n_jobs=1,
+                 solve_once=False):
         """
         Constructor
 
@@ -47,10 +82,14 @@ class FBackGEmanager:
         solve_symbolically: bool
         hidden_nds: list[str]
         delta: bool
+        n_jobs: int or None
+        solve_once: bool
         """
         self.n_max = n_max
         self.graph = graph
         self.solve_symbolically = solve_symbolically
+        self.n_jobs = n_jobs
+        self.solve_once = solve_once
         if hidden_nds is None:
             self.hidden_nds = []
         else:
@@ -63,25 +102,71 @@ class FBackGEmanager:
         # put columns in same order as graph.ord_nodes
         df = df[columns]
         dim = self.graph.num_nds
-        self.n_to_estimator = {}
-        for time in range(1, self.n_max):
-            slice_n = columns[(time-1)*dim: time*dim]
-            slice_n_plus_one = columns[time * dim: (time+1) * dim]
-            two_slices = slice_n + slice_n_plus_one
-            df_two_slices = df[two_slices]
-            self.n_to_estimator[time] = FBackGainsEstimator(
-                time,
-                graph,
-                df_two_slices,
-                solve_symbolically,
-                hidden_nds,
-                delta
-            )
-            self.n_to_estimator[time].calculate_gains()
-            self.mean_alpha_mat = None
-            self.std_of_alpha_mat = None
-            self.mean_beta_mat = None
-            self.std_of_beta_mat = None
+        cov_mats, cov2times_mats = FBackGEmanager.get_panel_cov_mats(
+            df.to_numpy(dtype=float), n_max, dim)
+        times = list(range(1, self.n_max))
+        generic_calc = None
+        if solve_symbolically and solve_once:
+            generic_calc = FBackGainsEstimator.get_generic_calc(graph,
+                                                                delta)
+        args_list = []
+        for time in times:
+            cov_mat_list_nm = [cov_mats[time - 1],
+                               cov2times_mats[time - 1],
+                               cov_mats[time]]
+            args_list.append((time,
+                              graph,
+                              None,
+                              solve_symbolically,
+                              hidden_nds,
+                              delta,
+                              generic_calc,
+                              cov_mat_list_nm))
+        # the time slices are independent of each other
+        if n_jobs == 1:
+            estimators = [make_fback_estimator(args) for args in args_list]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                estimators = list(executor.map(make_fback_estimator,
+                                               args_list))
+        self.n_to_estimator = dict(zip(times, estimators))
+        self.mean_alpha_mat = None
+        self.std_of_alpha_mat = None
+        self.mean_beta_mat = None
+        self.std_of_beta_mat = None
+
+    @staticmethod
+    def get_panel_cov_mats(data, n_max, dim):
+        """
+        This method calculates, in a single pass over the whole panel
+        'data', the covariance matrices needed by all the time slices.
+        Only the block tri-diagonal part of the full (n_max*dim, n_max*dim)
+        covariance matrix is calculated.
+
+        Parameters
+        ----------
+        data: np.array of shape=(num_rows, n_max*dim)
+            columns in the order of FBackRandomDataMaker.get_columns()
+        n_max: int
+        dim: int
+
+        Returns
+        -------
+        np.array, np.array
+            cov_mats of shape=(n_max, dim, dim), where cov_mats[t] is the
+            covariance matrix of time slice t+1, and cov2times_mats of
+            shape=(n_max-1, dim, dim), where cov2times_mats[t] is the
+            2-times covariance matrix between time slices t+1 and t+2.
+
+        """
+        num_rows = data.shape[0]
+        centered = data - data.mean(axis=0)
+        # shape=(n_max, num_rows, dim)
+        slices = centered.reshape(num_rows, n_max, dim).transpose(1, 0, 2)
+        slices_t = slices.transpose(0, 2, 1)
+        cov_mats = slices_t @ slices / (num_rows - 1)
+        cov2times_mats = slices_t[:-1] @ slices[1:] / (num_rows - 1)
+        return cov_mats, cov2times_mats
 
     def print_greek_lists(self, name, true_greek_mat=None, verbose=False):
         """
@@ -342,5 +427,17 @@ if __name__ == "__main__":
         mger.print_mean_beta_list(true_beta_mat=dmaker.beta_mat,
                                   verbose=True)
 
+        from time import time
+        for n_jobs, solve_once in [(1, False), (None, False), (1, True)]:
+            start = time()
+            mger = FBackGEmanager(n_max, graph, data_path,
+                                  solve_symbolically=True, n_jobs=n_jobs,
+                                  solve_once=solve_once)
+            print("n_jobs=", n_jobs, ", solve_once=", solve_once,
+                  "%.4f s" % (time() - start))
+            print("mean_alpha_mat=\n", np.mean(
+                [mger.n_to_estimator[t].alpha_mat_estimate for
+                 t in range(1, n_max)], axis=0))
+
 
     main()
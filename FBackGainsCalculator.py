@@ -1,4 +1,5 @@
 from GainsCalculator import *
+from simplification import *
 
 
 class FBackGainsCalculator(GainsCalculator):
@@ -54,16 +55,35 @@ class FBackGainsCalculator(GainsCalculator):
 
     Attributes
     ----------
-    # alpha_list and alpha_mat are inherited from parent class
+    # alpha_list, alpha_mat and alpha_records are inherited from parent
+    # class
     alpha_list_with_betas: list[sp.Eq]
     alpha_mat_with_betas: sp.Matrix
     beta_list: list[sp.Eq]
     beta_mat: sp.Matrix
+    beta_records: np.array of dtype SB_RECORD_DTYPE
+        the same equations as beta_list, as a structured numpy array. See
+        core_matrices.make_sb_records()
     delta: bool
+    simp_policy: str
+        simplification policy (see simplification.py): "none", "cancel",
+        "factor" or "simplify". Each entry of self.alpha_mat and
+        self.alpha_list is simplified once, after all the betas have been
+        substituted into A(B, CM_info). If delta=False, the betas are
+        simplified too, but never beyond sp.factor(). "none" is much
+        faster on graphs with more than a few nodes, and gives equivalent
+        (but less compact) expressions.
+    simp_timeout: None or float
+        timeout in seconds for the simplification of each expression
+    timed_out: bool
+        True iff the simplification of some expression timed out in the
+        last call to calculate_gains(). If so, its results are not stored
+        in the cache.
 
     """
 
-    def __init__(self, graph, delta=True):
+    def __init__(self, graph, delta=True, cache=None, simp_policy=None,
+                 simp_timeout="default"):
         """
         Constructor
 
@@ -71,9 +91,25 @@ class FBackGainsCalculator(GainsCalculator):
         ----------
         graph: FBackGraph
         delta: bool
+        cache: None or SymbolicCache
+        simp_policy: None or str
+            If None, the default policy of simplification.py (initially
+            "simplify") is used.
+        simp_timeout: "default" or None or float
+            If "default", the default timeout of simplification.py is used.
+            If None, there is no timeout.
         """
-        GainsCalculator.__init__(self, graph)
+        GainsCalculator.__init__(self, graph, cache=cache)
         self.delta = delta
+        default_policy, default_timeout = get_default_simp_policy()
+        if simp_policy is None:
+            simp_policy = default_policy
+        assert simp_policy in SIMP_POLICIES, simp_policy
+        self.simp_policy = simp_policy
+        if simp_timeout == "default":
+            simp_timeout = default_timeout
+        self.simp_timeout = simp_timeout
+        self.timed_out = False
 
         # self.alpha_list and self.alpha_mat are inherited from parent class.
         self.alpha_list_with_betas = None
@@ -81,6 +117,7 @@ class FBackGainsCalculator(GainsCalculator):
 
         self.beta_list = None
         self.beta_mat = None
+        self.beta_records = None
 
     def calculate_gains(self, cov_mat_list_in=None, mat_K=None, time="n"):
         """
@@ -109,6 +146,20 @@ class FBackGainsCalculator(GainsCalculator):
         """
         dim = self.graph.num_nds
 
+        key = None
+        if self.cache is not None and cov_mat_list_in is None:
+            key = SymbolicCache.get_key("fback_gains", self.graph,
+                                        time=time, delta=self.delta,
+                                        simp_policy=self.simp_policy)
+            cached = self.cache.load(key)
+            if cached is not None:
+                self.alpha_list_with_betas, self.alpha_mat_with_betas, \
+                    self.beta_list, self.beta_mat, \
+                    self.alpha_list, self.alpha_mat = cached
+                self.alpha_records = make_sb_records(self.alpha_list)
+                self.beta_records = make_sb_records(self.beta_list)
+                return
+
         if time == "n":
             time0 = "n"
             time1 = "n_plus_one"
@@ -127,20 +178,29 @@ class FBackGainsCalculator(GainsCalculator):
             cov_mat0, cov2times, cov_mat1 = cov_mat_list_in
             d_cov2times = cov2times - cov_mat0
 
-        mat_B = set_to_zero_fback_gains_without_arrows(self.graph,
-                                             beta_sb_mat(dim))
+        mat_B = beta_sb_mat_from_graph(self.graph)
         mat_K = mat_B * cov_mat0
 
         calc = GainsCalculator(self.graph)
         calc.calculate_gains(cov_mat_in=cov_mat1, mat_K=mat_K, time=time1)
-        self.alpha_mat_with_betas = deepcopy(calc.alpha_mat)
-        self.alpha_list_with_betas = deepcopy(calc.alpha_list)
+        # sympy expressions are immutable, so only the containers are
+        # copied, and the entries are shared with calc
+        self.alpha_mat_with_betas = calc.alpha_mat.copy()
+        self.alpha_list_with_betas = list(calc.alpha_list)
 
         self.alpha_mat = None
         self.alpha_list = None
 
+        self.timed_out = False
         self.calculate_betas(cov_mat0, cov2times, d_cov2times, time=time0)
         self.calculate_alphas()
+        self.alpha_records = make_sb_records(self.alpha_list)
+        self.beta_records = make_sb_records(self.beta_list)
+        if key is not None and not self.timed_out:
+            self.cache.save(key, (self.alpha_list_with_betas,
+                                  self.alpha_mat_with_betas,
+                                  self.beta_list, self.beta_mat,
+                                  self.alpha_list, self.alpha_mat))
 
     def calculate_betas(self, cov_mat0, cov2times, d_cov2times, time):
         """
@@ -162,8 +222,7 @@ class FBackGainsCalculator(GainsCalculator):
         """
         dim = self.graph.num_nds
 
-        mat_B = set_to_zero_fback_gains_without_arrows(self.graph,
-                                             beta_sb_mat(dim))
+        mat_B = beta_sb_mat_from_graph(self.graph)
 
         eq_list = eq_list0 = eq_list1 = None
         eq_mat = eq_mat0 = eq_mat1 = None
@@ -229,7 +288,11 @@ class FBackGainsCalculator(GainsCalculator):
         if not self.delta:
             sol_list, = linsolve(eq_list, unknowns)
             # print(str(sol_list))
-            sol_list = sp.factor(sol_list)
+            sol_list, timed_out = simplify_expr(sol_list, self.simp_policy,
+                                                self.simp_timeout,
+                                                max_policy="factor")
+            if timed_out:
+                self.timed_out = True
         else:
             sol_list0, = linsolve(eq_list0, unknowns0)
             sol_list1, = linsolve(eq_list1, unknowns1)
@@ -245,36 +308,41 @@ class FBackGainsCalculator(GainsCalculator):
         self.beta_mat = sp.zeros(dim)
         for i in range(len(sol_list)):
             self.beta_list.append(sp.Eq(unknowns[i], sol_list[i]))
-            left_str = str(unknowns[i])
-
-            if left_str[0:3] == 'beta':
-                # print("kkkll", left_str)
-                row_str, col_str = left_str[4:].split("_L_")
-                self.beta_mat[int(row_str), int(col_str)] = sol_list[i]
+            kind, row, col, _ = get_sb_info(unknowns[i])
+            if kind == 'beta':
+                self.beta_mat[row, col] = sol_list[i]
 
     def calculate_alphas(self):
         """
         This method fills in self.alpha_list and self.alpha_mat. It's an
         internal method called by calculate_gains().
 
+        All the betas are substituted at once, with a single xreplace() of
+        the dictionary beta_i_L_j -> self.beta_mat[i, j] (the entries of
+        self.beta_mat do not depend on the betas, so this is the same as
+        substituting them one at a time). Then each entry is simplified
+        only once, according to self.simp_policy.
+
         Returns
         -------
         None
 
         """
         dim = self.graph.num_nds
-        self.alpha_mat = deepcopy(self.alpha_mat_with_betas)
-        self.alpha_list = deepcopy(self.alpha_list_with_betas)
-        for row, col in product(range(dim), range(dim)):
-            beta_str = "beta_" + str(row) + "_L_" + str(col)
-            self.alpha_mat = sp.simplify(
-                self.alpha_mat.subs(sp.Symbol(beta_str),
-                self.beta_mat[row, col]))
-            for i in range(len(self.alpha_list)):
-                self.alpha_list[i] = sp.simplify(
-                    self.alpha_list[i].subs(sp.Symbol(beta_str),
-                            self.beta_mat[row, col]))
-        # print("ccvvf", self.alpha_mat)
+        subs_dict = {make_sb("beta_%d_L_%d", row, col):
+                     self.beta_mat[row, col]
+                     for row, col in product(range(dim), range(dim))}
+        # xreplace() returns new objects, so alpha_mat_with_betas and
+        # alpha_list_with_betas are never modified
+        self.alpha_mat = self.alpha_mat_with_betas.xreplace(subs_dict)
+        self.alpha_list = [eq.xreplace(subs_dict) for eq in
+                           self.alpha_list_with_betas]
+        results = [simplify_expr(x, self.simp_policy, self.simp_timeout)
+                   for x in [self.alpha_mat] + self.alpha_list]
+        self.alpha_mat = results[0][0]
+        self.alpha_list = [eq for eq, _ in results[1:]]
+        if any(timed_out for _, timed_out in results):
+            self.timed_out = True
 
     def print_alpha_list_with_betas(self, verbose=False, time="n"):
         """
@@ -347,4 +415,48 @@ if __name__ == "__main__":
         cal.print_beta_list(verbose=True)
         cal.print_alpha_list(verbose=True)
 
+        # memory benchmark: sharing the immutable entries of A(B, CM_info)
+        # versus deep-copying them, on fback-2node scaled up to feedback
+        # chains x0->x1->...  with all possible feedback arrows
+        import tracemalloc
+        from time import time
+        from copy import deepcopy
+        for num_nds in [2, 3, 4]:
+            dot = "digraph G {\n"
+            for i in range(num_nds - 1):
+                dot += "x%d->x%d;\n" % (i, i + 1)
+            for i, j in product(range(num_nds), range(num_nds)):
+                dot += "x%d->x%d[color=green, style=dashed];\n" % (i, j)
+            dot += "}"
+            with open("tempo13.txt", "w") as file:
+                file.write(dot)
+            graph = FBackGraph("tempo13.txt")
+            dim = graph.num_nds
+            calc = GainsCalculator(graph)
+            mat_K = beta_sb_mat_from_graph(graph) * cov_sb_mat(dim, time="n")
+            calc.calculate_gains(cov_mat_in=cov_sb_mat(dim, time="n_plus_one"),
+                                 mat_K=mat_K, time="n_plus_one")
+            for name, copy_fun in [
+                ("deepcopy", lambda: (deepcopy(calc.alpha_mat),
+                                      deepcopy(calc.alpha_list))),
+                ("shared", lambda: (calc.alpha_mat.copy(),
+                                    list(calc.alpha_list)))]:
+                tracemalloc.start()
+                start = time()
+                copies = copy_fun()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(num_nds, "nodes,", name + ":",
+                      "%.4f s," % (time() - start),
+                      "peak %.1f KB" % (peak/2**10))
+
+        graph = FBackGraph(path)
+        for simp_policy in ["simplify", "none"]:
+            start = time()
+            cal = FBackGainsCalculator(graph, simp_policy=simp_policy)
+            cal.calculate_gains()
+            print("simp_policy=", simp_policy,
+                  "%.4f s" % (time() - start))
+            print(cal.alpha_list)
+
     main()
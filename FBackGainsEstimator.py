@@ -39,6 +39,8 @@ class FBackGainsEstimator(GainsEstimator):
         Same as for alpha. See alpha explanation in parent class GainsEstimator
     beta_mat_estimate: np.array
         Same as for alpha. See alpha explanation in parent class GainsEstimator
+    beta_records: np.array of dtype SB_RECORD_DTYPE
+        Same as for alpha. See alpha explanation in parent class GainsEstimator
     cov_mat_list: list[sp.Matrix, sp.Matrix, sp.Matrix]
         [cov_mat0, cov2times, cov_mat1] where cov_mat0=covariance matrix at
         time n, cov2times=the 2-times covariance matrix between times n and
@@ -46,6 +48,10 @@ class FBackGainsEstimator(GainsEstimator):
         variable.
     delta: bool
         see explanation in docstring for class FBackGainsCalculator
+    generic_calc: FBackGainsCalculator or None
+        If not None, a calculator returned by get_generic_calc(). Its
+        solution, for the generic time "n", is renamed to time self.time
+        instead of solving the system of equations again.
     time: None or str or int
 
     """
@@ -56,7 +62,9 @@ class FBackGainsEstimator(GainsEstimator):
                  df,
                  solve_symbolically=False,
                  hidden_nds=None,
-                 delta=True):
+                 delta=True,
+                 generic_calc=None,
+                 cov_mat_list_nm=None):
         """
         Constructor
 
@@ -64,7 +72,8 @@ class FBackGainsEstimator(GainsEstimator):
         ----------
         time: None or str or int
         graph: FBackGraph
-        df: pd.Dataframe
+        df: pd.Dataframe or None
+            If None, cov_mat_list_nm must be given
         solve_symbolically: bool
             solve_symbolically=True if linsolve() is called using a fully
             symbolic covariance matrix, and then the numeric values of the
@@ -73,12 +82,23 @@ class FBackGainsEstimator(GainsEstimator):
             covariance matrix, partly symbolic, partly numeric.
         hidden_nds: None or list[str]
         delta: bool
+        generic_calc: None or FBackGainsCalculator
+            If not None, solve_symbolically is ignored, and the symbolic
+            solution in generic_calc is used. See get_generic_calc()
+        cov_mat_list_nm: None or list[np.array]
+            [cov_mat0, cov2times, cov_mat1] as numpy arrays of
+            shape=(dim, dim), with rows and columns in the order of
+            graph.ord_nodes. If not None, df is ignored. See
+            set_cov_mat_list()
         """
         GainsEstimator.__init__(self, graph, path=None,
                        solve_symbolically=solve_symbolically,
                        hidden_nds=hidden_nds)
         self.time = time
         self.delta = delta
+        if generic_calc is not None:
+            assert isinstance(time, int) and generic_calc.delta == delta
+        self.generic_calc = generic_calc
         dim = graph.num_nds
         # alpha version of the following already defined
         # by parent method
@@ -86,9 +106,13 @@ class FBackGainsEstimator(GainsEstimator):
         self.beta_mat_estimate = np.zeros((dim, dim))
         self.beta_cum_err = 0
         self.beta_list = None
+        self.beta_records = None
 
         self.cov_mat_list = None
-        self.set_cov_mat(df)
+        if cov_mat_list_nm is not None:
+            self.set_cov_mat_list(cov_mat_list_nm)
+        else:
+            self.set_cov_mat(df)
         self.calculate_gains()
         self.fix_alpha_list()
         self.fix_beta_list()
@@ -117,7 +141,27 @@ class FBackGainsEstimator(GainsEstimator):
             cov_mat_nm[np.ix_(range(dim), range(dim))],
             cov_mat_nm[np.ix_(range(dim), range(dim, 2 * dim))],
             cov_mat_nm[np.ix_(range(dim, 2 * dim), range(dim, 2 * dim))]]
+        self.set_cov_mat_list(cov_mat_list_nm)
+
+    def set_cov_mat_list(self, cov_mat_list_nm):
+        """
+        This method sets the values of the 3 sp.Matrices in
+        self.cov_mat_list = [cov_mat0, cov2times, cov_mat1] from their
+        numeric (nm) values in cov_mat_list_nm. Entries of these matrix
+        that have hidden nodes in their indices, are symbolic. All other
+        entries are numeric.
+
+        Parameters
+        ----------
+        cov_mat_list_nm: list[np.array]
+            [cov_mat0, cov2times, cov_mat1], each of shape=(dim, dim)
+
+        Returns
+        -------
+        None
 
+        """
+        dim = self.graph.num_nds
         cov_mat0 = cov_sb_mat(dim, time=self.time)
         cov2times = cov2times_sb_mat(dim, time=self.time)
         cov_mat1 = cov_sb_mat(dim, time=self.time + 1)
@@ -143,6 +187,16 @@ class FBackGainsEstimator(GainsEstimator):
 
         """
         dim = self.graph.num_nds
+        if self.generic_calc is not None:
+            renaming = FBackGainsEstimator.get_time_renaming_dict(
+                dim, self.time)
+            self.alpha_records = xreplace_records(
+                self.generic_calc.alpha_records, renaming)
+            self.beta_records = xreplace_records(
+                self.generic_calc.beta_records, renaming)
+            self.alpha_list = get_eq_list_from_records(self.alpha_records)
+            self.beta_list = get_eq_list_from_records(self.beta_records)
+            return
         calc = FBackGainsCalculator(self.graph, delta=self.delta)
         if self.solve_symbolically:
             cov_mat0 = cov_sb_mat(dim, time=self.time)
@@ -157,72 +211,104 @@ class FBackGainsEstimator(GainsEstimator):
 
         self.alpha_list = calc.alpha_list
         self.beta_list = calc.beta_list
+        self.alpha_records = calc.alpha_records
+        self.beta_records = calc.beta_records
 
-    def fix_greek_list(self, name,
-                       greek_list, greek_mat_estimate, greek_cum_err):
+    @staticmethod
+    def get_generic_calc(graph, delta=True):
         """
-        This method modifies the list "greek_list" (which must be either an
-        "alpha_list" or a "beta_list"). For "greek_list": (1) it changes the
-        constraint items (2) it inserts numerical values if
-        solve_symbolically=True. It also calculates from "greek_list",
-        the numpy matrix "greek_mat_estimate" and the float "greek_cum_err".
+        This method returns an FBackGainsCalculator whose gains have been
+        solved with fully symbolic covariance matrices at the generic time
+        "n" (i.e., with the symbols cov_n_i_j, cov2times_n_i_j and
+        cov_n_plus_one_i_j). The same symbolic solution is valid at every
+        time t, after renaming those symbols with get_time_renaming_dict().
 
         Parameters
         ----------
-        name: str
-            either "alpha" or "beta"
-        greek_list: list[sp.Eq]
-            either "alpha_list" or "beta_list"
-        greek_mat_estimate: np.array
-            either "alpha_mat_estimate" or "beta_mat_estimate"
-        greek_cum_err: float
-            either "alpha_cum_err" or "beta_cum_err"
+        graph: FBackGraph
+        delta: bool
 
         Returns
         -------
-        None
+        FBackGainsCalculator
+
+        """
+        dim = graph.num_nds
+        calc = FBackGainsCalculator(graph, delta=delta)
+        # same covariance matrices as in calculate_gains() with
+        # solve_symbolically=True
+        cov_mat_list_in = [cov_sb_mat(dim, time="n"),
+                           cov2times_sb_mat(dim, time="n"),
+                           cov_sb_mat(dim, time="n_plus_one")]
+        calc.calculate_gains(cov_mat_list_in=cov_mat_list_in,
+                             mat_K=None,
+                             time="n")
+        return calc
+
+    @staticmethod
+    def get_time_renaming_dict(dim, time):
+        """
+        This method returns a dictionary that renames the covariance
+        symbols at the generic time "n" to the same symbols at time 'time'.
+        For example, cov_n_0_1 -> cov_n5_0_1, cov_n_plus_one_0_1 ->
+        cov_n6_0_1, cov2times_n_0_1 -> cov2times_n5_0_1 and
+        d_cov2times_n_0_1 -> d_cov2times_n5_0_1, if time=5.
+
+        Parameters
+        ----------
+        dim: int
+        time: int
+
+        Returns
+        -------
+        dict[sp.Symbol, sp.Symbol]
+
+        """
+        renaming = {}
+        pairs = [(cov_sb_mat(dim, time="n"), cov_sb_mat(dim, time=time)),
+                 (cov_sb_mat(dim, time="n_plus_one"),
+                  cov_sb_mat(dim, time=time + 1)),
+                 (cov2times_sb_mat(dim, time="n"),
+                  cov2times_sb_mat(dim, time=time)),
+                 (cov2times_sb_mat(dim, time="n", delta=True),
+                  cov2times_sb_mat(dim, time=time, delta=True))]
+        for generic_mat, mat in pairs:
+            renaming.update(zip(generic_mat, mat))
+        return renaming
+
+    def get_cov_subs_dict(self):
+        """
+        This method overrides the parent method. It returns a dictionary
+        that maps each 1-time covariance symbol at times self.time and
+        self.time+1, and each 2-times covariance symbol, that does not have
+        a hidden node in its indices, to its numeric value in
+        self.cov_mat_list.
+
+        Returns
+        -------
+        dict[sp.Symbol, float]
 
         """
         dim = self.graph.num_nds
-        len0 = len(name)
-        for i in range(len(greek_list)):
-            eq = greek_list[i]
-            str0 = str(eq.args[0])
-            # last 2 terms in split("_")
-            if str0[0:len0] != name:
-                # print("hhgd", str0.split("_")[-2:])
-                row_str, col_str = str0.split("_")[-2:]
-                str1 = "err" + "_" + row_str + "_" + col_str
-                eq = sp.Eq(sp.Symbol(str1),
-                           eq.args[0] - eq.args[1])
-            for row, col in product(range(dim), range(dim)):
-                row_nd = self.graph.ord_nodes[row]
-                col_nd = self.graph.ord_nodes[col]
-                symbolic = (row_nd in self.hidden_nds) or\
-                          (col_nd in self.hidden_nds)
-                if not symbolic:
-                    sb_str = sb_cov_str(row, col, time=self.time)
-                    eq = eq.subs(sb_str, self.cov_mat_list[0][row, col])
-
-                    sb_str = sb_cov2times_str(row, col, time=self.time)
-                    eq = eq.subs(sb_str, self.cov_mat_list[1][row, col])
-
-                    sb_str = sb_cov_str(row, col, time=self.time+1)
-                    eq = eq.subs(sb_str, self.cov_mat_list[2][row, col])
-
-            greek_list[i] = eq
-
-            str1 = str(eq.args[1])
-            try:
-                xx = float(str1)
-            except ValueError:
-                xx = np.nan
-            if str0[0:len0] == name:
-                row_str, col_str = str0[len0+1:len(str0)].split("_L_")
-                row, col = int(row_str), int(col_str)
-                greek_mat_estimate[row, col] = xx
-            else:
-                greek_cum_err += abs(xx)
+        subs_dict = {}
+        for row, col in product(range(dim), range(dim)):
+            row_nd = self.graph.ord_nodes[row]
+            col_nd = self.graph.ord_nodes[col]
+            symbolic = (row_nd in self.hidden_nds) or\
+                      (col_nd in self.hidden_nds)
+            if not symbolic:
+                sb_str = sb_cov_str(row, col, time=self.time)
+                subs_dict.setdefault(sp.Symbol(sb_str),
+                                     self.cov_mat_list[0][row, col])
+
+                sb_str = sb_cov2times_str(row, col, time=self.time)
+                subs_dict.setdefault(sp.Symbol(sb_str),
+                                     self.cov_mat_list[1][row, col])
+
+                sb_str = sb_cov_str(row, col, time=self.time+1)
+                subs_dict.setdefault(sp.Symbol(sb_str),
+                                     self.cov_mat_list[2][row, col])
+        return subs_dict
 
     @staticmethod
     def get_greek_list_comments(name,
@@ -248,52 +334,47 @@ class FBackGainsEstimator(GainsEstimator):
         list[str]
 
         """
-        comments = []
-        len0 = len(name)
-        for i in range(len(greek_list)):
-            str0 = str(greek_list[i].args[0])
-            if str0[0:len0] == name:
-                row_str, col_str = str0[len0 + 1:].split("_L_")
-                row, col = int(row_str), int(col_str)
-                comments.append("(true= " +
-                                ("%.6f" % true_greek_mat[row, col]) + ")")
-            else:
-                comments.append("")
-        return comments
+        return GainsEstimator.get_records_comments(
+            name, make_sb_records(greek_list), true_greek_mat)
 
     def fix_alpha_list(self):
         """
-        This method modifies self.alpha_list by calling self.fix_greek_list()
+        This method modifies self.alpha_list by calling
+        GainsEstimator.fix_records()
 
         Returns
         -------
         None
 
         """
-        self.fix_greek_list("alpha",
-                       self.alpha_list,
-                       self.alpha_mat_estimate,
-                       self.alpha_cum_err)
+        self.alpha_records, self.alpha_cum_err = \
+            GainsEstimator.fix_records("alpha",
+                                       self.alpha_records,
+                                       self.get_cov_subs_dict(),
+                                       self.alpha_mat_estimate)
+        self.alpha_list = get_eq_list_from_records(self.alpha_records)
 
     def fix_beta_list(self):
         """
-       This method modifies self.beta_list by calling self.fix_greek_list()
-
+        This method modifies self.beta_list by calling
+        GainsEstimator.fix_records()
 
         Returns
         -------
         None
 
         """
-        self.fix_greek_list("beta",
-                       self.beta_list, 
-                       self.beta_mat_estimate, 
-                       self.beta_cum_err)
+        self.beta_records, self.beta_cum_err = \
+            GainsEstimator.fix_records("beta",
+                                       self.beta_records,
+                                       self.get_cov_subs_dict(),
+                                       self.beta_mat_estimate)
+        self.beta_list = get_eq_list_from_records(self.beta_records)
 
     def get_alpha_list_comments(self, true_alpha_mat):
         """
         This method returns a list of comments about self.alpha_list. To do
-        this, it calls self.get_greek_list_comments().
+        this, it calls GainsEstimator.get_records_comments().
 
         Parameters
         ----------
@@ -304,14 +385,14 @@ class FBackGainsEstimator(GainsEstimator):
         list[str]
 
         """
-        return FBackGainsEstimator.get_greek_list_comments("alpha",
-                                                           self.alpha_list,
-                                                           true_alpha_mat)
+        return GainsEstimator.get_records_comments("alpha",
+                                                   self.alpha_records,
+                                                   true_alpha_mat)
 
     def get_beta_list_comments(self, true_beta_mat):
         """
         This method returns a list of comments about self.beta_list. To do
-        this, it calls self.get_greek_list_comments().
+        this, it calls GainsEstimator.get_records_comments().
 
         Parameters
         ----------
@@ -322,9 +403,9 @@ class FBackGainsEstimator(GainsEstimator):
         list[str]
 
         """
-        return FBackGainsEstimator.get_greek_list_comments("beta",
-                                                           self.beta_list,
-                                                           true_beta_mat)
+        return GainsEstimator.get_records_comments("beta",
+                                                   self.beta_records,
+                                                   true_beta_mat)
 
     def print_alpha_list(self, true_alpha_mat=None, verbose=False):
         """
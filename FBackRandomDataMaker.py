@@ -162,7 +162,57 @@ class FBackRandomDataMaker(RandomDataMaker):
 
         return n_to_nd_values
 
-    def write_dataset_csv(self, num_rows, path):
+    def generate_random_instances(self, num_rows):
+        """
+        This method returns an array with 'num_rows' rows of random values
+        for the nodes 'graph.ord_nodes' at times n=1,2,3, ..., n_max. It is
+        a batched version of generate_one_random_instance(), and it yields
+        the same distribution.
+
+        For each time n, it draws the whole noise matrix eps^{[n]} at once
+        and then solves
+
+        x^{[n]} = (1-A).inv() (eps^{[n]} + B x^{[n-1]})
+
+        for all rows in a single matrix operation, where A = self.alpha_mat,
+        B = self.beta_mat and x^{[0]} = 0.
+
+        Parameters
+        ----------
+        num_rows: int
+
+        Returns
+        -------
+        np.array of shape=(num_rows, n_max*dim)
+            The columns are in the order given by get_columns().
+
+        """
+        dim = self.graph.num_nds
+        one_minus_A_inv = np.linalg.inv(np.eye(dim) - self.alpha_mat)
+        data = np.empty((num_rows, self.n_max*dim))
+        nd_values = np.zeros((num_rows, dim))
+        for n in range(1, self.n_max+1):
+            eps = np.random.normal(loc=10,
+                                   scale=self.sigma_eps,
+                                   size=(num_rows, dim))
+            nd_values = (eps + nd_values @ self.beta_mat.T) @ \
+                one_minus_A_inv.T
+            data[:, (n-1)*dim: n*dim] = nd_values
+        return data
+
+    def get_dataset_columns(self):
+        """
+        This method overrides the parent method. It returns the column
+        labels given by get_columns().
+
+        Returns
+        -------
+        list[str]
+
+        """
+        return FBackRandomDataMaker.get_columns(self.n_max, self.graph)
+
+    def write_dataset_csv(self, num_rows, path, batched=True):
         """
         This method writes a file which contains a dataset in the
         comma-separated-values (csv) format. The dataset has: (1) column
@@ -175,6 +225,10 @@ class FBackRandomDataMaker(RandomDataMaker):
             number of rows of the dataset
         path: str
             path to the destination of the output file
+        batched: bool
+            If batched=True, all rows are generated at once by
+            generate_random_instances(). If batched=False, the rows are
+            generated one at a time by generate_one_random_instance().
 
         Returns
         -------
@@ -183,6 +237,11 @@ class FBackRandomDataMaker(RandomDataMaker):
         """
         dim = self.graph.num_nds
         columns = FBackRandomDataMaker.get_columns(self.n_max, self.graph)
+        if batched:
+            df = pd.DataFrame(self.generate_random_instances(num_rows),
+                              columns=columns)
+            df.to_csv(path, index=False)
+            return
         df = pd.DataFrame(columns=columns)
         for row in range(num_rows):
             n_to_nd_values = self.generate_one_random_instance()
@@ -1,7 +1,9 @@
 from core_matrices import *
 from numerical_subs import *
+from SymbolicCache import *
 from sympy.solvers.solveset import linsolve
 from copy import deepcopy
+import numpy as np
 
 
 class GainsCalculator:
@@ -17,6 +19,9 @@ class GainsCalculator:
 
     Attributes
     ----------
+    alpha_kernel_cache: dict[tuple, function]
+        class attribute. Cache of compiled numeric kernels, keyed by graph
+        structure and set of hidden nodes. Filled by get_alpha_kernel()
     alpha_list: list[sp.Eq]
         list of symbols, where each symbol in the list is an equation of the
         form:
@@ -30,22 +35,41 @@ class GainsCalculator:
     alpha_mat: sp.Matrix
         the symbolic solutions for the gains \alpha_{i|j} as an sp.Matrix.
         alpha_{i|j}=0 if arrow x_j->x_i missing.
+    alpha_records: np.array of dtype SB_RECORD_DTYPE
+        the same equations as alpha_list, as a structured numpy array with
+        fields (kind, row, col, lhs, expr, value). See
+        core_matrices.make_sb_records()
+    cache: None or SymbolicCache
+        If not None, the results of calculate_gains() with a fully symbolic
+        covariance matrix are stored in, and read from, this on-disk cache.
     graph: Graph
+    solved_calc_cache: dict[tuple, GainsCalculator]
+        class attribute. Cache of calculators whose gains have been solved
+        fully symbolically, keyed by graph structure. Filled by
+        get_solved_calc()
 
     """
+    solved_calc_cache = {}
+    alpha_kernel_cache = {}
 
-    def __init__(self, graph):
+    def __init__(self, graph, cache=None):
         """
         Constructor
 
         Parameters
         ----------
         graph: Graph
+        cache: None or SymbolicCache
+            If None, SymbolicCache.get_default() is used.
 
         """
         self.graph = graph
         self.alpha_list = None
         self.alpha_mat = None
+        self.alpha_records = None
+        if cache is None:
+            cache = SymbolicCache.get_default()
+        self.cache = cache
 
     def calculate_gains(self, cov_mat_in=None, mat_K=None, time=None):
         """
@@ -70,11 +94,19 @@ class GainsCalculator:
         """
         dim = self.graph.num_nds
 
+        key = None
+        if self.cache is not None and cov_mat_in is None and mat_K is None:
+            key = SymbolicCache.get_key("gains", self.graph, time=time)
+            cached = self.cache.load(key)
+            if cached is not None:
+                self.alpha_list, self.alpha_mat = cached
+                self.alpha_records = make_sb_records(self.alpha_list)
+                return
+
         if mat_K is None:
             mat_K = sp.zeros(dim)
         # print('hhgffd', mat_K)
-        A = set_to_zero_gains_without_arrows(self.graph,
-                                             alpha_sb_mat(dim))
+        A = alpha_sb_mat_from_graph(self.graph)
         self.alpha_list = []
         self.alpha_mat = sp.zeros(dim)
 
@@ -118,11 +150,152 @@ class GainsCalculator:
             # print(str(sol_list))
             for i in range(row):
                 self.alpha_list.append(sp.Eq(unknowns[i], sol_list[i]))
-                left_str = str(unknowns[i])
-                if left_str[0:5] == 'alpha':
-                    # print("kkkll", left_str)
-                    row_str, col_str = left_str[6:].split("_L_")
-                    self.alpha_mat[int(row_str), int(col_str)] = sol_list[i]
+                kind, sb_row, sb_col, _ = get_sb_info(unknowns[i])
+                if kind == 'alpha':
+                    self.alpha_mat[sb_row, sb_col] = sol_list[i]
+        self.alpha_records = make_sb_records(self.alpha_list)
+        if key is not None:
+            self.cache.save(key, (self.alpha_list, self.alpha_mat))
+
+    def compile_alpha_kernel(self, hidden_nds=None):
+        """
+        This method compiles (with sp.lambdify) the symbolic solutions in
+        self.alpha_list into a vectorized numpy function, called a kernel.
+        calculate_gains() must have been called before, with a fully
+        symbolic covariance matrix and time=None.
+
+        The kernel takes as input a numeric covariance matrix of
+        shape=(dim, dim), or a stack of them of shape=(batch, dim, dim),
+        with rows and columns in the order of graph.ord_nodes. It returns
+        the alpha matrix (or a stack of them) with the same meaning as
+        GainsEstimator.alpha_mat_estimate, and the cumulative error (or an
+        array of them) with the same meaning as GainsEstimator.alpha_cum_err.
+
+        Entries of the input that have a hidden node as row or column index
+        are ignored. Gains and errors that depend on them are set to np.nan.
+
+        Parameters
+        ----------
+        hidden_nds: None or list[str]
+
+        Returns
+        -------
+        function
+            np.array -> (np.array, np.array or float)
+
+        """
+        if hidden_nds is None:
+            hidden_nds = []
+        dim = self.graph.num_nds
+        hidden_pos = [self.graph.node_position(nd) for nd in hidden_nds]
+        cov_mat = cov_sb_mat(dim, time=None)
+        observed = [(row, col) for row in range(dim) for col in
+                    range(row, dim) if row not in hidden_pos and
+                    col not in hidden_pos]
+        args = [cov_mat[row, col] for row, col in observed]
+
+        records = self.alpha_records
+        is_alpha = records["kind"] == "alpha"
+        alpha_exprs = list(records["expr"][is_alpha])
+        err_exprs = [lhs - expr for lhs, expr in
+                     zip(records["lhs"][~is_alpha],
+                         records["expr"][~is_alpha])]
+        exprs = alpha_exprs + err_exprs
+        # expressions that depend on hidden covariances can't be evaluated
+        args_set = set(args)
+        computable = [expr.free_symbols.issubset(args_set) for expr in exprs]
+        fun = sp.lambdify(args,
+                          [expr for expr, ok in zip(exprs, computable) if ok],
+                          modules="numpy")
+        num_alphas = len(alpha_exprs)
+        alpha_rows = records["row"][is_alpha]
+        alpha_cols = records["col"][is_alpha]
+
+        def kernel(cov_mats):
+            cov_mats = np.asarray(cov_mats, dtype=float)
+            batch_shape = cov_mats.shape[:-2]
+            computed = iter(fun(*[cov_mats[..., row, col] for
+                                  row, col in observed]))
+            values = np.full((len(exprs),) + batch_shape, np.nan)
+            for k in range(len(exprs)):
+                if computable[k]:
+                    values[k] = next(computed)
+            alpha_mats = np.zeros(batch_shape + (dim, dim))
+            alpha_mats[..., alpha_rows, alpha_cols] = \
+                np.moveaxis(values[:num_alphas], 0, -1)
+            cum_errs = np.sum(np.abs(values[num_alphas:]), axis=0)
+            return alpha_mats, cum_errs
+
+        return kernel
+
+    @staticmethod
+    def get_graph_key(graph):
+        """
+        This method returns a hashable key that describes the structure of
+        'graph': its ordered nodes and its arrows.
+
+        Parameters
+        ----------
+        graph: Graph
+
+        Returns
+        -------
+        tuple
+
+        """
+        return tuple(graph.ord_nodes), tuple(sorted(graph.arrows))
+
+    @staticmethod
+    def get_solved_calc(graph):
+        """
+        This method returns a GainsCalculator for 'graph' whose gains have
+        been solved with a fully symbolic covariance matrix and time=None.
+        The calculator is solved only once per graph structure and then
+        stored in GainsCalculator.solved_calc_cache.
+
+        Parameters
+        ----------
+        graph: Graph
+
+        Returns
+        -------
+        GainsCalculator
+
+        """
+        key = GainsCalculator.get_graph_key(graph)
+        if key not in GainsCalculator.solved_calc_cache:
+            calc = GainsCalculator(graph)
+            calc.calculate_gains()
+            GainsCalculator.solved_calc_cache[key] = calc
+        return GainsCalculator.solved_calc_cache[key]
+
+    @staticmethod
+    def get_alpha_kernel(graph, hidden_nds=None):
+        """
+        This method returns the kernel compiled by compile_alpha_kernel()
+        for 'graph' and 'hidden_nds'. The kernel is compiled only once per
+        graph structure and set of hidden nodes, and then stored in
+        GainsCalculator.alpha_kernel_cache.
+
+        Parameters
+        ----------
+        graph: Graph
+        hidden_nds: None or list[str]
+
+        Returns
+        -------
+        function
+
+        """
+        if hidden_nds is None:
+            hidden_nds = []
+        key = GainsCalculator.get_graph_key(graph) + \
+            (tuple(sorted(hidden_nds)),)
+        if key not in GainsCalculator.alpha_kernel_cache:
+            calc = GainsCalculator.get_solved_calc(graph)
+            GainsCalculator.alpha_kernel_cache[key] = \
+                calc.compile_alpha_kernel(hidden_nds)
+        return GainsCalculator.alpha_kernel_cache[key]
 
     def print_alpha_list(self, verbose=False, time=None):
         """
@@ -161,6 +334,20 @@ if __name__ == "__main__":
         cal.print_alpha_list(verbose=True)
         print(cal.alpha_mat)
 
+        # covariance matrix of the SCM with all gains equal to 1/2
+        dim = graph.num_nds
+        alpha_mat = np.zeros((dim, dim))
+        for row, col in product(range(dim), range(dim)):
+            if (graph.ord_nodes[col], graph.ord_nodes[row]) in graph.arrows:
+                alpha_mat[row, col] = .5
+        one_minus_A_inv = np.linalg.inv(np.eye(dim) - alpha_mat)
+        cov_mat = one_minus_A_inv @ one_minus_A_inv.T
+        kernel = GainsCalculator.get_alpha_kernel(graph)
+        alpha_mats, cum_errs = kernel(np.stack([cov_mat]*3))
+        print(alpha_mats[0], cum_errs)
+        kernel = GainsCalculator.get_alpha_kernel(graph, hidden_nds=["s"])
+        print(kernel(cov_mat))
+
 
     main()
 
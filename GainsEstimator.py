@@ -1,3 +1,4 @@
+import os
 import pandas as pd
 import numpy as np
 from copy import deepcopy
@@ -6,6 +7,7 @@ import sympy as sp
 from Graph import *
 from RandomDataMaker import *
 from GainsCalculator import *
+from CovAccumulator import *
 
 
 class GainsEstimator:
@@ -39,19 +41,47 @@ class GainsEstimator:
         the covariances. Caveat: if there are hidden nodes, the right
         hand sides of these equations may contain symbolic expressions
         pertaining to covariances alluding to hidden nodes.
+    alpha_records: np.array of dtype SB_RECORD_DTYPE
+        the same equations as alpha_list, as a structured numpy array with
+        fields (kind, row, col, lhs, expr, value). alpha_mat_estimate and
+        alpha_cum_err are calculated from the "value" field. See
+        core_matrices.make_sb_records()
     alpha_mat_estimate: np.array of shape=(dim, dim), where dim=number of nodes
         estimate of the alpha matrix. Contains estimates for the gains
         \alpha_{i|j}. If a particular \alpha_{i|j} estimate can't be
         converted to a float (because, for example, it depends on hidden
         variables), it is set to np.nan. \alpha_{i|j} estimates for
         non-existent arrows are set to 0.
+    alpha_mat_ci: np.array of shape=(2, dim, dim) or None
+        lower (alpha_mat_ci[0]) and upper (alpha_mat_ci[1]) bounds of the
+        bootstrap percentile confidence interval of each gain. Only
+        calculated by calculate_bootstrap(); it's None otherwise.
+    alpha_mat_se: np.array of shape=(dim, dim) or None
+        bootstrap standard error of each entry of alpha_mat_estimate. Only
+        calculated by calculate_bootstrap(); it's None otherwise.
+    alpha_err_mat: np.array of shape=(dim, dim)
+        This is only calculated if fast_numeric=True. It's set to None
+        otherwise. alpha_err_mat[i, j] = err_i_j for each missing arrow
+        x_i->x_j with i<j, and 0 for all other entries.
     cov_mat: sp.Matrix
         Let cov_mat_nm be the numpy, numeric (nm) covariance matrix
         calculated from the input dataset. cov_mat is a sp.Matrix of the
         same dimension as cov_mat_nm that coincides with cov_mat_nm on those
         entries that do not have a hidden node as row or column index. Those
         entries of cov_mat that do have hidden nodes in their indices,
-        are symbolic (sb).
+        are symbolic (sb). If fast_numeric=True, cov_mat is not used and is
+        set to None.
+    cov_mat_nm: np.array of shape=(dim, dim)
+        numpy, numeric (nm) covariance matrix calculated from the input
+        dataset, with rows and columns in the order of graph.ord_nodes.
+    fast_numeric: bool
+        If fast_numeric=True, the gains are estimated by
+        calculate_gains_numerically(), which uses numpy only and bypasses
+        sympy entirely. This is only allowed if there are no hidden nodes
+        and solve_symbolically=False. alpha_mat_estimate and alpha_cum_err
+        have the same meaning for both values of fast_numeric. alpha_list
+        is only built (from alpha_mat_estimate and alpha_err_mat) if it is
+        printed.
     graph: Graph
     hidden_nds: list[str] or None
         This is a list of the nodes that are hidden.
@@ -60,26 +90,52 @@ class GainsEstimator:
         "solve_symbolically=True" if you want to solve the system of
         equations symbolically first, and then substitute numerical values.
         Use "solve_symbolically=False" if you want to substitute numerical
-        values first. Both techniques should yield the same answer.
+        values first. Both techniques should yield the same answer. The
+        symbolic solution is only computed once per graph structure (see
+        GainsCalculator.get_solved_calc()).
     """
 
     def __init__(self, graph,
                  path,
                  solve_symbolically=False,
-                 hidden_nds=None):
+                 hidden_nds=None,
+                 fast_numeric=False,
+                 cov_mat_nm=None,
+                 file_columns=None):
         """
 
         Parameters
         ----------
         graph: Graph
-        path: str
-            path to input file containing dataset
+        path: str or None
+            path to input file containing dataset. A ".npy", ".parquet" or
+            ".arrow"/".feather" file is streamed through a CovAccumulator
+            (the .npy and .arrow files are memory mapped), so the dataset
+            is never held in memory. See CovAccumulator.ingest_file(). A
+            file with any other extension (e.g., ".csv" or ".txt") is read
+            whole with pandas, as a csv file.
         solve_symbolically: bool
         hidden_nds: None or list[str]
+        fast_numeric: bool
+        cov_mat_nm: None or np.array of shape=(dim, dim)
+            If not None, path is ignored, and the gains are estimated from
+            this covariance matrix, with rows and columns in the order of
+            graph.ord_nodes (for example, one returned by
+            CovAccumulator.get_cov_mat())
+        file_columns: None or list[str]
+            only used if path is a .npy file, which has no column labels.
+            Labels of the columns of the array in the file. If None,
+            they are assumed to be graph.ord_nodes.
         """
         self.graph = graph
         df = None
-        if path is not None:
+        if path is not None and cov_mat_nm is None and \
+                os.path.splitext(path)[1].lower() in \
+                [".npy", ".parquet", ".arrow", ".feather"]:
+            acc = CovAccumulator(graph.ord_nodes)
+            acc.ingest_file(path, file_columns=file_columns)
+            cov_mat_nm = acc.get_cov_mat()
+        elif path is not None and cov_mat_nm is None:
             df = pd.read_csv(path)
             assert set(df.columns) == set(graph.ord_nodes)
             # put columns in same order as graph.ord_nodes
@@ -90,17 +146,31 @@ class GainsEstimator:
         else:
             assert set(hidden_nds).issubset(graph.ord_nodes)
             self.hidden_nds = hidden_nds
+        self.fast_numeric = fast_numeric
+        if fast_numeric:
+            assert not self.hidden_nds and not solve_symbolically
 
         dim = graph.num_nds
         self.alpha_mat_estimate = np.zeros((dim, dim))
         self.alpha_cum_err = 0
         self.alpha_list = None
+        self.alpha_records = None
+        self.alpha_err_mat = None
+        self.alpha_mat_se = None
+        self.alpha_mat_ci = None
 
         self.cov_mat = None
+        self.cov_mat_nm = None
         if df is not None:
-            self.set_cov_mat(df)
-            self.calculate_gains()
-            self.fix_alpha_list()
+            cov_mat_nm = df.cov().to_numpy()
+        if cov_mat_nm is not None:
+            if fast_numeric:
+                self.cov_mat_nm = np.asarray(cov_mat_nm, dtype=float)
+                self.calculate_gains_numerically()
+            else:
+                self.set_cov_mat_nm(cov_mat_nm)
+                self.calculate_gains()
+                self.fix_alpha_list()
 
     def set_cov_mat(self, df):
         """
@@ -119,7 +189,27 @@ class GainsEstimator:
         """
         if df is None:
             assert False
-        cov_mat_nm = df.cov().to_numpy()
+        self.set_cov_mat_nm(df.cov().to_numpy())
+
+    def set_cov_mat_nm(self, cov_mat_nm):
+        """
+        This method sets self.cov_mat_nm and the sp.Matrix called
+        self.cov_mat from the numeric (nm) covariance matrix 'cov_mat_nm'.
+        Entries of self.cov_mat that have hidden nodes in their indices,
+        are symbolic. All other entries are numeric.
+
+        Parameters
+        ----------
+        cov_mat_nm: np.array of shape=(dim, dim)
+            rows and columns in the order of graph.ord_nodes
+
+        Returns
+        -------
+        None
+
+        """
+        cov_mat_nm = np.asarray(cov_mat_nm, dtype=float)
+        self.cov_mat_nm = cov_mat_nm
         dim = self.graph.num_nds
         self.cov_mat = cov_sb_mat(dim, time=None)
         for row, col in product(range(dim), range(dim)):
@@ -141,16 +231,282 @@ class GainsEstimator:
         None
 
         """
-        dim = self.graph.num_nds
-        calc = GainsCalculator(self.graph)
         if self.solve_symbolically:
-            cov_mat_in = cov_sb_mat(dim, time=None)
-        else:
-            cov_mat_in = self.cov_mat
-
-        calc.calculate_gains(cov_mat_in=cov_mat_in,
-                                 mat_K=None, time=None)
+            # the symbolic solution only depends on the graph structure,
+            # so it is solved once and reused
+            calc = GainsCalculator.get_solved_calc(self.graph)
+            self.alpha_list = list(calc.alpha_list)
+            self.alpha_records = calc.alpha_records
+            return
+        calc = GainsCalculator(self.graph)
+        calc.calculate_gains(cov_mat_in=self.cov_mat,
+                             mat_K=None, time=None)
         self.alpha_list = calc.alpha_list
+        self.alpha_records = calc.alpha_records
+
+    @staticmethod
+    def get_numeric_estimates(graph, cov_mat_nm):
+        """
+        This method estimates the gains \alpha_{i|j} from the numeric
+        covariance matrix 'cov_mat_nm', using numpy only. It solves the same
+        system of linear equations as GainsCalculator.calculate_gains(),
+        but directly. For each node x_j with parents pa(j), the gains of the
+        arrows pointing into x_j are
+
+        \alpha_{j|pa(j)} = cov[pa(j), pa(j)].inv() cov[pa(j), j]
+
+        and, for each node x_i with i<j that is not a parent of x_j, the
+        error of the constraint on the covariances is
+
+        err_{i,j} = cov[i, j] - cov[i, pa(j)] \alpha_{j|pa(j)}
+
+        cov_mat_nm can also be a stack of covariance matrices of
+        shape=(batch, dim, dim). In that case, each linear system is solved
+        for the whole batch with a single call to np.linalg.solve(),
+        and the returned arrays have shape=(batch, dim, dim).
+
+        Parameters
+        ----------
+        graph: Graph
+        cov_mat_nm: np.array of shape=(dim, dim) or (batch, dim, dim)
+            covariance matrix with rows and columns in the order of
+            graph.ord_nodes
+
+        Returns
+        -------
+        np.array, np.array
+            alpha_mat_estimate and alpha_err_mat, both of the same shape
+            as cov_mat_nm
+
+        """
+        dim = graph.num_nds
+        arrows = set(graph.arrows)
+        cov_mat_nm = np.asarray(cov_mat_nm, dtype=float)
+        alpha_mat = np.zeros(cov_mat_nm.shape)
+        err_mat = np.zeros(cov_mat_nm.shape)
+        for row in range(1, dim):
+            row_nd = graph.ord_nodes[row]
+            pa = [i for i in range(row) if
+                  (graph.ord_nodes[i], row_nd) in arrows]
+            non_pa = [i for i in range(row) if i not in pa]
+            alphas = np.zeros(cov_mat_nm.shape[:-2] + (0,))
+            if pa:
+                alphas = np.linalg.solve(
+                    cov_mat_nm[..., pa, :][..., :, pa],
+                    cov_mat_nm[..., pa, row][..., np.newaxis])[..., 0]
+                alpha_mat[..., row, pa] = alphas
+            if non_pa:
+                err_mat[..., non_pa, row] = cov_mat_nm[..., non_pa, row] - \
+                    np.einsum("...ij,...j->...i",
+                              cov_mat_nm[..., non_pa, :][..., :, pa],
+                              alphas)
+        return alpha_mat, err_mat
+
+    @staticmethod
+    def get_cov_mats(graph, inputs):
+        """
+        This method returns a stack of numeric covariance matrices,
+        one for each dataset in 'inputs', with rows and columns in the order
+        of graph.ord_nodes.
+
+        Parameters
+        ----------
+        graph: Graph
+        inputs: list[pd.DataFrame or str] or np.array
+            either a list of datasets, each one given as a pd.DataFrame or
+            as the path to a csv file, or an array of covariance matrices
+            of shape=(batch, dim, dim), in which case it is returned as is.
+
+        Returns
+        -------
+        np.array of shape=(batch, dim, dim)
+
+        """
+        dim = graph.num_nds
+        if isinstance(inputs, np.ndarray):
+            assert inputs.ndim == 3 and inputs.shape[1:] == (dim, dim)
+            return inputs
+        cov_mats = np.empty((len(inputs), dim, dim))
+        for i, df in enumerate(inputs):
+            if isinstance(df, str):
+                df = pd.read_csv(df)
+            assert set(df.columns) == set(graph.ord_nodes)
+            cov_mats[i] = df[graph.ord_nodes].cov().to_numpy()
+        return cov_mats
+
+    @staticmethod
+    def estimate_batch(graph, inputs, hidden_nds=None):
+        """
+        This method estimates the gains of the same graph for a whole batch
+        of datasets. It returns the same alpha_mat_estimate and
+        alpha_cum_err that a GainsEstimator would calculate for each
+        dataset, but stacked along a first (batch) axis.
+
+        The graph analysis is done only once for the whole batch. If there
+        are no hidden nodes, the estimates are calculated by
+        get_numeric_estimates(), with one batched np.linalg.solve() per
+        node. Otherwise, they are calculated by the compiled kernel
+        returned by GainsCalculator.get_alpha_kernel(), which solves the
+        graph symbolically only once.
+
+        Parameters
+        ----------
+        graph: Graph
+        inputs: list[pd.DataFrame or str] or np.array
+            see get_cov_mats()
+        hidden_nds: None or list[str]
+
+        Returns
+        -------
+        np.array, np.array
+            alpha_mat_estimate of shape=(batch, dim, dim) and
+            alpha_cum_err of shape=(batch,)
+
+        """
+        cov_mats = GainsEstimator.get_cov_mats(graph, inputs)
+        if hidden_nds:
+            kernel = GainsCalculator.get_alpha_kernel(graph, hidden_nds)
+            return kernel(cov_mats)
+        alpha_mats, err_mats = \
+            GainsEstimator.get_numeric_estimates(graph, cov_mats)
+        return alpha_mats, np.sum(np.abs(err_mats), axis=(-2, -1))
+
+    @staticmethod
+    def get_bootstrap_cov_mats(data, num_boot, seed=None, batch_size=1000):
+        """
+        This method returns the covariance matrices of 'num_boot' bootstrap
+        resamples (with replacement) of the rows of 'data'.
+
+        A resample is represented by the vector w of shape=(num_rows,)
+        of the number of times each row was drawn (a multinomial vector
+        that sums to num_rows). If x_c are the centered rows of data,
+        the covariance matrix of the resample is
+
+        (sum_r w_r x_c[r] x_c[r]^T - num_rows m m^T)/(num_rows - 1)
+
+        where m = sum_r w_r x_c[r]/num_rows is the mean of the resample.
+        The per-row products x_c[r]_i x_c[r]_j (i<=j) are calculated only
+        once, so, for a batch of resamples, all the covariance matrices
+        are given by a single matrix product of the batch of w's with those
+        products. The resamples are drawn in batches of 'batch_size',
+        to bound the size of the matrix of w's.
+
+        Parameters
+        ----------
+        data: np.array of shape=(num_rows, dim)
+        num_boot: int
+        seed: None or int
+        batch_size: int
+
+        Returns
+        -------
+        np.array of shape=(num_boot, dim, dim)
+
+        """
+        data = np.asarray(data, dtype=float)
+        num_rows, dim = data.shape
+        assert num_rows > 1
+        rng = np.random.default_rng(seed)
+        centered = data - data.mean(axis=0)
+        rows, cols = np.triu_indices(dim)
+        prods = centered[:, rows] * centered[:, cols]
+        cov_mats = np.empty((num_boot, dim, dim))
+        pvals = np.full(num_rows, 1/num_rows)
+        for start in range(0, num_boot, batch_size):
+            stop = min(start + batch_size, num_boot)
+            weights = rng.multinomial(num_rows, pvals,
+                                      size=stop - start).astype(float)
+            means = weights @ centered / num_rows
+            upper = weights @ prods - \
+                num_rows * means[:, rows] * means[:, cols]
+            cov_mats[start:stop, rows, cols] = upper
+            cov_mats[start:stop, cols, rows] = upper
+        return cov_mats / (num_rows - 1)
+
+    def calculate_bootstrap(self, data, num_boot=1000, conf_level=.95,
+                            seed=None, batch_size=1000):
+        """
+        This method fills self.alpha_mat_se and self.alpha_mat_ci with the
+        bootstrap standard errors and percentile confidence intervals of
+        the gains. The covariance matrices of all the resamples are
+        calculated by get_bootstrap_cov_mats(), and the gains of all of
+        them are estimated with a single batched call to
+        get_numeric_estimates(). This is only allowed if there are no
+        hidden nodes.
+
+        Parameters
+        ----------
+        data: pd.DataFrame or np.array of shape=(num_rows, dim)
+            the dataset. If it's an np.array, its columns must be in the
+            order of graph.ord_nodes
+        num_boot: int
+            number of bootstrap resamples
+        conf_level: float
+            confidence level of the intervals, in (0, 1)
+        seed: None or int
+        batch_size: int
+
+        Returns
+        -------
+        None
+
+        """
+        assert not self.hidden_nds
+        assert 0 < conf_level < 1
+        if isinstance(data, pd.DataFrame):
+            assert set(data.columns) == set(self.graph.ord_nodes)
+            data = data[self.graph.ord_nodes].to_numpy(dtype=float)
+        cov_mats = GainsEstimator.get_bootstrap_cov_mats(
+            data, num_boot, seed=seed, batch_size=batch_size)
+        alpha_mats, _ = GainsEstimator.get_numeric_estimates(self.graph,
+                                                             cov_mats)
+        self.alpha_mat_se = np.std(alpha_mats, axis=0, ddof=1)
+        tail = (1 - conf_level)/2
+        self.alpha_mat_ci = np.quantile(alpha_mats, [tail, 1 - tail], axis=0)
+
+    def calculate_gains_numerically(self):
+        """
+        This method fills self.alpha_mat_estimate, self.alpha_err_mat and
+        self.alpha_cum_err by calling get_numeric_estimates() on
+        self.cov_mat_nm. No sympy objects are created.
+
+        Returns
+        -------
+        None
+
+        """
+        self.alpha_mat_estimate, self.alpha_err_mat = \
+            GainsEstimator.get_numeric_estimates(self.graph, self.cov_mat_nm)
+        self.alpha_cum_err = np.sum(np.abs(self.alpha_err_mat))
+        self.alpha_list = None
+
+    def get_alpha_list_from_estimates(self):
+        """
+        This method returns a list[sp.Eq] with the same entries, in the same
+        order, as the alpha_list produced by fix_alpha_list(). It is built
+        from self.alpha_mat_estimate and self.alpha_err_mat, so it is only
+        used if fast_numeric=True.
+
+        Returns
+        -------
+        list[sp.Eq]
+
+        """
+        dim = self.graph.num_nds
+        arrows = set(self.graph.arrows)
+        alpha_list = []
+        for row in range(1, dim):
+            row_nd = self.graph.ord_nodes[row]
+            for i in range(row):
+                if (self.graph.ord_nodes[i], row_nd) in arrows:
+                    alpha_list.append(sp.Eq(
+                        make_sb("alpha_%d_L_%d", row, i),
+                        sp.Float(self.alpha_mat_estimate[row, i])))
+                else:
+                    alpha_list.append(sp.Eq(
+                        make_sb("err_%d_%d", i, row),
+                        sp.Float(self.alpha_err_mat[i, row])))
+        return alpha_list
 
     def fix_alpha_list(self):
         """
@@ -163,39 +519,107 @@ class GainsEstimator:
         -------
         None
 
+        """
+        self.alpha_records, self.alpha_cum_err = \
+            GainsEstimator.fix_records("alpha",
+                                       self.alpha_records,
+                                       self.get_cov_subs_dict(),
+                                       self.alpha_mat_estimate)
+        self.alpha_list = get_eq_list_from_records(self.alpha_records)
+
+    def get_cov_subs_dict(self):
+        """
+        This method returns a dictionary that maps each covariance symbol
+        that does not have a hidden node in its indices, to its numeric
+        value in self.cov_mat.
+
+        Returns
+        -------
+        dict[sp.Symbol, float]
+
         """
         dim = self.graph.num_nds
-        for i in range(len(self.alpha_list)):
-            eq = self.alpha_list[i]
-            str0 = str(eq.args[0])
-            # last 2 terms in split("_")
-            if str0[0:5] != "alpha":
-                # print("hhgd", str0.split("_")[-2:])
-                row_str, col_str = str0.split("_")[-2:]
-                str1 = "err" + "_" + row_str + "_" + col_str
-                eq = sp.Eq(sp.Symbol(str1),
-                           eq.args[0] - eq.args[1])
-            for row, col in product(range(dim), range(dim)):
-                row_nd = self.graph.ord_nodes[row]
-                col_nd = self.graph.ord_nodes[col]
-                symbolic = (row_nd in self.hidden_nds) or\
-                          (col_nd in self.hidden_nds)
-                if not symbolic:
-                    sb_str = sb_cov_str(row, col, time=None)
-                    eq = eq.subs(sb_str, self.cov_mat[row, col])
-            self.alpha_list[i] = eq
-            # print("llkkl", eq)
-            str1 = str(eq.args[1])
-            try:
-                xx = float(str1)
-            except ValueError:
-                xx = np.nan
-            if str0[0:5] == "alpha":
-                row_str, col_str = str0[6:len(str0)].split("_L_")
-                row, col = int(row_str), int(col_str)
-                self.alpha_mat_estimate[row, col] = xx
-            else:
-                self.alpha_cum_err += abs(xx)
+        subs_dict = {}
+        for row, col in product(range(dim), range(dim)):
+            row_nd = self.graph.ord_nodes[row]
+            col_nd = self.graph.ord_nodes[col]
+            symbolic = (row_nd in self.hidden_nds) or \
+                       (col_nd in self.hidden_nds)
+            if not symbolic:
+                sb = sp.Symbol(sb_cov_str(row, col, time=None))
+                subs_dict.setdefault(sb, self.cov_mat[row, col])
+        return subs_dict
+
+    @staticmethod
+    def fix_records(name, records, subs_dict, greek_mat_estimate):
+        """
+        This method returns a copy of 'records' (which must be either
+        "alpha_records" or "beta_records") in which (1) the constraint
+        records have been changed into err_i_j = lhs - expr (2) the
+        covariances in 'subs_dict' have been substituted by their numeric
+        values, with a single xreplace() over all the records (see
+        core_matrices.xreplace_records()). The "value" field of the
+        copy is then used to fill 'greek_mat_estimate' in place, and to
+        calculate the cumulative error.
+
+        Parameters
+        ----------
+        name: str
+            either "alpha" or "beta"
+        records: np.array of dtype SB_RECORD_DTYPE
+        subs_dict: dict[sp.Symbol, float]
+        greek_mat_estimate: np.array
+            either "alpha_mat_estimate" or "beta_mat_estimate"
+
+        Returns
+        -------
+        np.array of dtype SB_RECORD_DTYPE, float
+
+        """
+        records = records.copy()
+        is_greek = records["kind"] == name
+        is_err = ~is_greek
+        # object arrays, so "-" acts on the sympy expressions elementwise
+        records["expr"][is_err] = \
+            records["lhs"][is_err] - records["expr"][is_err]
+        err_sbs = np.empty(np.count_nonzero(is_err), dtype=object)
+        err_sbs[:] = [make_sb("err_%d_%d", row, col) for row, col in
+                      zip(records["row"][is_err], records["col"][is_err])]
+        records["lhs"][is_err] = err_sbs
+        records["kind"][is_err] = "err"
+        records = xreplace_records(records, subs_dict, fields=("expr",))
+        values = records["value"]
+        greek_mat_estimate[records["row"][is_greek],
+                           records["col"][is_greek]] = values[is_greek]
+        greek_cum_err = np.sum(np.abs(values[~is_greek]))
+        return records, greek_cum_err
+
+    @staticmethod
+    def get_records_comments(name, records, true_greek_mat):
+        """
+        This method returns a list[str] of the same length as 'records'.
+        The returned list will be used as comments, to be printed to the
+        right of each entry, when the entries of 'records' are printed.
+
+        Parameters
+        ----------
+        name: str
+            either "alpha" or "beta"
+        records: np.array of dtype SB_RECORD_DTYPE
+        true_greek_mat: np.array
+            the alpha (or beta) matrix used to calculate the synthetic data.
+
+        Returns
+        -------
+        list[str]
+
+        """
+        is_greek = records["kind"] == name
+        true_values = np.asarray(true_greek_mat, dtype=float)[
+            records["row"], records["col"]]
+        comments = np.where(is_greek,
+                            np.char.mod("(true= %.6f)", true_values), "")
+        return [str(comment) for comment in comments]
 
     def get_alpha_list_comments(self, true_alpha_mat):
         """
@@ -212,17 +636,9 @@ class GainsEstimator:
         list[str]
 
         """
-        comments = []
-        for i in range(len(self.alpha_list)):
-            str0 = str(self.alpha_list[i].args[0])
-            if str0[0:5] == "alpha":
-                row_str, col_str = str0[6:].split("_L_")
-                row, col = int(row_str), int(col_str)
-                comments.append("(true= " +
-                                ("%.6f" % true_alpha_mat[row, col]) + ")")
-            else:
-                comments.append("")
-        return comments
+        return GainsEstimator.get_records_comments("alpha",
+                                                   self.alpha_records,
+                                                   true_alpha_mat)
 
     def print_alpha_list(self, true_alpha_mat=None, verbose=False):
         """
@@ -242,6 +658,9 @@ class GainsEstimator:
         None
 
         """
+        if self.fast_numeric and self.alpha_list is None:
+            self.alpha_list = self.get_alpha_list_from_estimates()
+            self.alpha_records = make_sb_records(self.alpha_list)
         comments = self.get_alpha_list_comments(true_alpha_mat)
         return print_list_sb(self.alpha_list, self.graph,
                              verbose=verbose, time=None,
@@ -288,5 +707,82 @@ if __name__ == "__main__":
                                   verbose=True)
             print("alpha_mat_estimate=\n", gest.alpha_mat_estimate)
             print("alpha_cum_err=", gest.alpha_cum_err)
+        print("************** fast_numeric=True")
+        gest = GainsEstimator(graph, data_path, fast_numeric=True)
+        gest.print_alpha_list(true_alpha_mat=dmaker.alpha_mat,
+                              verbose=True)
+        print("alpha_mat_estimate=\n", gest.alpha_mat_estimate)
+        print("alpha_cum_err=", gest.alpha_cum_err)
+
+        print("************** estimate_batch()")
+        from time import time
+        df_list = [pd.DataFrame(dmaker.generate_random_instances(num_rows),
+                                columns=graph.ord_nodes)
+                   for i in range(1000)]
+        cov_mats = GainsEstimator.get_cov_mats(graph, df_list)
+        for hidden_nds in [None, ["s"]]:
+            start = time()
+            alpha_mats, cum_errs = GainsEstimator.estimate_batch(
+                graph, cov_mats, hidden_nds=hidden_nds)
+            print("hidden_nds=", hidden_nds, ", batch of", len(cov_mats),
+                  "in %.4f s" % (time() - start))
+            print("mean alpha_mat_estimate=\n", np.mean(alpha_mats, axis=0))
+            print("mean alpha_cum_err=", np.mean(cum_errs))
+
+        print("************** columnar input files")
+        big_num_rows = 1000000
+        data = dmaker.generate_random_instances(big_num_rows)
+        big_df = pd.DataFrame(data, columns=graph.ord_nodes)
+        big_df.to_csv("test_data_big.csv", index=False)
+        # reversed column order, to check the mapping by file_columns
+        np.save("test_data_big.npy", data[:, ::-1].copy())
+        paths = ["test_data_big.csv", "test_data_big.npy"]
+        try:
+            import pyarrow as pa
+            import pyarrow.feather
+            big_df.to_parquet("test_data_big.parquet")
+            pa.feather.write_feather(big_df, "test_data_big.arrow",
+                                     compression="uncompressed")
+            paths += ["test_data_big.parquet", "test_data_big.arrow"]
+        except ImportError:
+            print("pyarrow not installed. Skipping parquet and arrow")
+        for path in paths:
+            start = time()
+            gest = GainsEstimator(graph, path, fast_numeric=True,
+                                  file_columns=graph.ord_nodes[::-1])
+            print(path, "in %.4f s" % (time() - start))
+            print("alpha_mat_estimate=\n", gest.alpha_mat_estimate)
+
+        print("************** bootstrap")
+        gest = GainsEstimator(graph, data_path, fast_numeric=True)
+        gest.calculate_bootstrap(df, num_boot=1000, seed=0)
+        print("alpha_mat_estimate=\n", gest.alpha_mat_estimate)
+        print("alpha_mat_se=\n", gest.alpha_mat_se)
+        print("alpha_mat_ci=\n", gest.alpha_mat_ci)
+        print("true alpha_mat=\n", dmaker.alpha_mat)
+        # bigger graph: a random DAG with 30 nodes
+        num_nds = 30
+        rng = np.random.default_rng(0)
+        dot = "digraph G {\n"
+        for i, j in product(range(num_nds), range(num_nds)):
+            if i < j and rng.random() < .2:
+                dot += "x%d->x%d;\n" % (i, j)
+        dot += "}"
+        with open("tempo13.txt", "w") as file:
+            file.write(dot)
+        big_graph = Graph("tempo13.txt")
+        big_dmaker = RandomDataMaker(big_graph,
+                                     mean_eps=[0]*big_graph.num_nds,
+                                     sig_eps=[10]*big_graph.num_nds,
+                                     alpha_bound=1)
+        big_df = pd.DataFrame(big_dmaker.generate_random_instances(1000),
+                              columns=big_graph.ord_nodes)
+        gest = GainsEstimator(big_graph, None, fast_numeric=True,
+                              cov_mat_nm=big_df.cov().to_numpy())
+        start = time()
+        gest.calculate_bootstrap(big_df, num_boot=10000, seed=0)
+        print(big_graph.num_nds, "nodes, 1000 rows, 10000 resamples",
+              "in %.4f s" % (time() - start))
+        print("max alpha_mat_se=", np.max(gest.alpha_mat_se))
 
     main()
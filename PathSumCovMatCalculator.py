@@ -0,0 +1,211 @@
+from CovMatCalculator import *
+
+
+class PathSumCovMatCalculator(CovMatCalculator):
+    """
+    This class is a subclass of 'CovMatCalculator'. It calculates the same
+    covariance matrix C and Jacobian matrix J as its parent class, but,
+    instead of multiplying dense symbolic matrices, it calculates each
+    entry separately, by summing over the paths of graph.nx_graph (this is
+    known as Sewall Wright's path tracing rules).
+
+    Let x_i = sum_{p in pa(i)} \alpha_{i|p} x_p + \epsilon_i. Then
+
+    (1-A).inv()_{i, j} = sum over all directed paths from x_j to x_i of
+    the product of the gains along the path
+
+    <\epsilon_i, x_j> = sum_k <\epsilon_i, \epsilon_k> (1-A).inv()_{j, k}
+
+    <x_i, x_j> = sum_{p in pa(i)} \alpha_{i|p} <x_p, x_j> +
+    <\epsilon_i, x_j>
+
+    J_{i, j} = <x_i, x_j>/<x_j, x_j>
+
+    All 3 quantities are memoized, so directed paths and treks (pairs of
+    directed paths with a common source) that share sub-paths are only
+    summed over once. The results are compact, factored expressions that
+    are not passed through sp.simplify().
+
+    This class only overrides the calculation of single entries. The lazy
+    accessors get_cov() and get_pder(), and calculate_cov_mat(),
+    are inherited from the parent class.
+
+    Attributes
+    ----------
+    eps_x_memo: dict[(int, int), sp.Expr]
+        memoized <\epsilon_i, x_j>, keyed by (i, j)
+    pa_list: list[list[int]]
+        pa_list[i] is the list of the positions of the parents of node i
+    total_effect_memo: dict[(int, int), sp.Expr]
+        memoized entries of (1-A).inv(), keyed by (row, col)
+
+    """
+
+    def __init__(self, graph, conditioned_nds=None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        graph: Graph
+        conditioned_nds: None or list[str]
+        """
+        CovMatCalculator.__init__(self, graph,
+                                  conditioned_nds=conditioned_nds,
+                                  inv_method="triangular")
+        arrows = set(graph.arrows)
+        dim = graph.num_nds
+        self.pa_list = [[k for k in range(i) if
+                         (graph.ord_nodes[k], graph.ord_nodes[i]) in arrows]
+                        for i in range(dim)]
+        self.eps_cov_mat = self.get_eps_cov_mat()
+        self.total_effect_memo = {}
+        self.eps_x_memo = {}
+
+    @staticmethod
+    def alpha_sb(row, col):
+        """
+        This method returns the symbol for the gain \alpha_{row|col}.
+
+        Parameters
+        ----------
+        row: int
+        col: int
+
+        Returns
+        -------
+        sp.Symbol
+
+        """
+        return make_sb("alpha_%d_L_%d", row, col)
+
+    def get_total_effect_entry(self, row, col):
+        """
+        This method returns the entry (row, col) of (1-A).inv(),
+        i.e., the sum over all directed paths from x_col to x_row of the
+        product of the gains along the path.
+
+        Parameters
+        ----------
+        row: int
+        col: int
+
+        Returns
+        -------
+        sp.Expr
+
+        """
+        if row == col:
+            return sp.Integer(1)
+        if row < col:
+            return sp.Integer(0)
+        key = (row, col)
+        if key not in self.total_effect_memo:
+            self.total_effect_memo[key] = sp.Add(
+                *[PathSumCovMatCalculator.alpha_sb(row, p) *
+                  self.get_total_effect_entry(p, col)
+                  for p in self.pa_list[row] if p >= col])
+        return self.total_effect_memo[key]
+
+    def get_eps_x_entry(self, i, j):
+        """
+        This method returns <\epsilon_i, x_j>.
+
+        Parameters
+        ----------
+        i: int
+        j: int
+
+        Returns
+        -------
+        sp.Expr
+
+        """
+        key = (i, j)
+        if key not in self.eps_x_memo:
+            # (1-A).inv()_{j, k} = 0 for k > j
+            self.eps_x_memo[key] = sp.Add(
+                *[self.eps_cov_mat[i, k] *
+                  self.get_total_effect_entry(j, k)
+                  for k in range(j + 1) if self.eps_cov_mat[i, k] != 0])
+        return self.eps_x_memo[key]
+
+    def get_one_minus_A_inv(self):
+        """
+        This method overrides the parent method. It builds (1-A).inv()
+        from the memoized entries get_total_effect_entry().
+
+        Returns
+        -------
+        sp.Matrix
+
+        """
+        if self.one_minus_A_inv_sb is None:
+            dim = self.graph.num_nds
+            self.one_minus_A_inv_sb = sp.Matrix(
+                dim, dim, lambda i, j: self.get_total_effect_entry(i, j))
+        return self.one_minus_A_inv_sb
+
+    def get_cov_entry(self, row, col):
+        """
+        This method overrides the parent method. It returns the entry (row,
+        col) of the covariance matrix C, calculated by path summation.
+
+        Parameters
+        ----------
+        row: int
+        col: int
+
+        Returns
+        -------
+        sp.Expr
+
+        """
+        if self.cov_mat_sb is not None:
+            return self.cov_mat_sb[row, col]
+        # C is symmetric, and the recursion is over the parents of the
+        # later node
+        row, col = max(row, col), min(row, col)
+        key = (row, col)
+        if key not in self.cov_memo:
+            self.cov_memo[key] = sp.Add(
+                *[PathSumCovMatCalculator.alpha_sb(row, p) *
+                  self.get_cov_entry(p, col) for p in self.pa_list[row]]) + \
+                self.get_eps_x_entry(row, col)
+        return self.cov_memo[key]
+
+
+if __name__ == "__main__":
+    import os
+
+    def main():
+        # check agreement with the matrix formulation of the parent class
+        # on every DAG in dot_atlas
+        for fname in sorted(os.listdir('dot_atlas')):
+            if fname[-4:] != '.dot':
+                continue
+            with open('dot_atlas/' + fname) as f:
+                if "green" in f.read():
+                    # has feedback loops
+                    continue
+            graph = Graph('dot_atlas/' + fname)
+            for conditioned_nds in [None, [graph.ord_nodes[-1]]]:
+                cal = CovMatCalculator(graph, conditioned_nds)
+                cal.calculate_cov_mat()
+                ps_cal = PathSumCovMatCalculator(graph, conditioned_nds)
+                ps_cal.calculate_cov_mat()
+                agree = all(sp.simplify(x - y) == 0 for x, y in
+                            zip(list(cal.cov_mat_sb) + list(cal.jacobian_sb),
+                                list(ps_cal.cov_mat_sb) +
+                                list(ps_cal.jacobian_sb)))
+                print(fname, conditioned_nds, "agree=", agree)
+
+        path = 'dot_atlas/good_bad_trols_G1.dot'
+        graph = Graph(path)
+        ps_cal = PathSumCovMatCalculator(graph)
+        print("<X, Y>=", ps_cal.get_cov("X", "Y"))
+        print("pder Y wrt X=", ps_cal.get_pder("Y", "X"))
+        ps_cal.calculate_cov_mat()
+        ps_cal.print_cov_mat(verbose=True)
+
+    main()
@@ -4,6 +4,7 @@ from itertools import product
 import pandas as pd
 from random import randint, uniform
 import math
+import time
 
 def my_random(bound):
     """
@@ -136,7 +137,41 @@ class RandomDataMaker:
 
         return nd_values
 
-    def write_dataset_csv(self, num_rows, path):
+    def generate_random_instances(self, num_rows):
+        """
+        This method returns an array with 'num_rows' rows of random values
+        for the nodes 'graph.ord_nodes'. It is a batched version of
+        generate_one_random_instance(), and it yields the same distribution.
+
+        Instead of looping over nodes, it draws the whole noise matrix eps
+        at once and then solves
+
+        x = (1-A).inv() eps
+
+        for all rows in a single matrix operation, where A is the strictly
+        lower triangular part of self.alpha_mat (the only part that
+        generate_one_random_instance() uses).
+
+        Parameters
+        ----------
+        num_rows: int
+
+        Returns
+        -------
+        np.array of shape=(num_rows, dim)
+
+        """
+        dim = self.graph.num_nds
+        eps = np.random.normal(loc=10,
+                               scale=self.sigma_eps,
+                               size=(num_rows, dim))
+        mat_A = np.tril(self.alpha_mat, -1)
+        one_minus_A_inv = np.linalg.inv(np.eye(dim) - mat_A)
+        # x_r = (1-A).inv() eps_r for each row r, so
+        # x = eps (1-A).inv().T for the matrix of all rows
+        return eps @ one_minus_A_inv.T
+
+    def write_dataset_csv(self, num_rows, path, batched=True):
         """
         This method writes a file which contains a dataset in the
         comma-separated-values (csv) format. The dataset has (1) column
@@ -149,17 +184,130 @@ class RandomDataMaker:
             number of rows of the dataset
         path: str
             path to the destination of the output file
+        batched: bool
+            If batched=True, all rows are generated at once by
+            generate_random_instances(). If batched=False, the rows are
+            generated one at a time by generate_one_random_instance().
 
         Returns
         -------
         None
 
         """
-        df = pd.DataFrame(columns=self.graph.ord_nodes)
-        for row in range(num_rows):
-            df.loc[row] = self.generate_one_random_instance()
+        if batched:
+            df = pd.DataFrame(self.generate_random_instances(num_rows),
+                              columns=self.graph.ord_nodes)
+        else:
+            df = pd.DataFrame(columns=self.graph.ord_nodes)
+            for row in range(num_rows):
+                df.loc[row] = self.generate_one_random_instance()
         df.to_csv(path, index=False)
 
+    def get_dataset_columns(self):
+        """
+        This method returns the list of column labels of the datasets
+        generated by this class, in the same order as the columns of the
+        array returned by generate_random_instances().
+
+        Returns
+        -------
+        list[str]
+
+        """
+        return list(self.graph.ord_nodes)
+
+    def write_dataset_in_chunks(self, num_rows, path, chunk_size=100000,
+                                file_format=None, verbose=True):
+        """
+        This method writes a dataset to a file, like write_dataset_csv(),
+        but it never holds more than 'chunk_size' rows in memory. The rows
+        are generated by generate_random_instances() in chunks of
+        'chunk_size' rows, and each chunk is flushed to the file before
+        the next one is generated. This makes it possible to write datasets
+        that are larger than RAM.
+
+        Three file formats are supported:
+
+        "csv": comma-separated-values, with column labels in the first line
+
+        "parquet": Apache Parquet, one row group per chunk (requires pyarrow)
+
+        "npy": raw numpy array of shape=(num_rows, num_columns). The column
+        labels are not stored in the file. They are given by
+        get_dataset_columns().
+
+        Parameters
+        ----------
+        num_rows: int
+            number of rows of the dataset
+        path: str
+            path to the destination of the output file
+        chunk_size: int
+            number of rows generated and written at a time
+        file_format: None or str
+            "csv", "parquet" or "npy". If None, the format is inferred from
+            the extension of 'path'.
+        verbose: bool
+            If True, the rows/second throughput is printed after each chunk.
+
+        Returns
+        -------
+        float
+            overall throughput in rows/second
+
+        """
+        assert chunk_size > 0
+        if file_format is None:
+            file_format = path.split(".")[-1].lower()
+        assert file_format in ["csv", "parquet", "npy"], file_format
+        columns = self.get_dataset_columns()
+
+        writer = None
+        if file_format == "csv":
+            # header line only; chunks are appended below it
+            pd.DataFrame(columns=columns).to_csv(path, index=False)
+        elif file_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([(col, pa.float64()) for col in columns])
+            writer = pq.ParquetWriter(path, schema)
+        elif file_format == "npy":
+            writer = np.lib.format.open_memmap(
+                path, mode="w+", dtype=np.float64,
+                shape=(num_rows, len(columns)))
+
+        start_time = time.perf_counter()
+        rows_done = 0
+        # the writer is closed even if generating or writing a chunk fails,
+        # so the rows written so far are left in a readable file
+        try:
+            while rows_done < num_rows:
+                rows = min(chunk_size, num_rows - rows_done)
+                chunk = self.generate_random_instances(rows)
+                if file_format == "csv":
+                    pd.DataFrame(chunk, columns=columns).to_csv(
+                        path, index=False, header=False, mode="a")
+                elif file_format == "parquet":
+                    writer.write_table(pa.Table.from_arrays(
+                        [chunk[:, k] for k in range(len(columns))],
+                        schema=schema))
+                else:
+                    writer[rows_done: rows_done + rows] = chunk
+                    writer.flush()
+                rows_done += rows
+                rate = rows_done / (time.perf_counter() - start_time)
+                if verbose:
+                    print("%d/%d rows written, %.0f rows/s" %
+                          (rows_done, num_rows, rate))
+        finally:
+            if file_format == "parquet":
+                writer.close()
+            elif file_format == "npy":
+                del writer
+
+        elapsed = time.perf_counter() - start_time
+        return rows_done / elapsed if rows_done > 0 else 0.0
+
 
 if __name__ == "__main__":
     def main(draw):
@@ -203,5 +351,11 @@ if __name__ == "__main__":
         num_rows = 5
         dmaker.write_dataset_csv(num_rows, data_path)
         print(pd.read_csv(data_path))
+        print("------------------------------")
+        num_rows = 10**6
+        for data_path in ["test_data.csv", "test_data.npy"]:
+            print(data_path)
+            dmaker.write_dataset_in_chunks(num_rows, data_path,
+                                           chunk_size=250000)
 
     main(True)
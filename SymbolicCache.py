@@ -0,0 +1,244 @@
+import os
+import pickle
+import hashlib
+import sympy as sp
+
+# part of every key. It must be incremented whenever a change in scumpy
+# changes a result that is stored in the cache (or the way it is
+# pickled), so that the files written by older versions are not reused.
+CACHE_FORMAT_VERSION = 2
+
+
+class SymbolicCache:
+    """
+    The purpose of this class is to store on disk the symbolic results (
+    sp.Matrix, list[sp.Eq], etc.) calculated by CovMatCalculator,
+    GainsCalculator and their subclasses, so that they don't have to be
+    recalculated from scratch every time a notebook is run.
+
+    The cache is content-addressed. Each result is stored in a pickle file
+    whose name is a hash (the key) of everything the result depends on:
+    the kind of result, the ordered nodes, arrows, amputated arrows and
+    feedback arrows of the graph, the conditioned nodes, the time, any
+    extra options, the sympy version and CACHE_FORMAT_VERSION.
+
+    When the total size of the cache files exceeds 'max_bytes',
+    the least recently used files are deleted.
+
+    If the environment variable SCUMPY_CACHE_DIR is set, the calculators
+    use a cache in that directory by default (see get_default()). The
+    environment variable SCUMPY_CACHE_MAX_MB can be used to change the
+    default size limit.
+
+    Attributes
+    ----------
+    cache_dir: str
+        directory where the pickle files are stored
+    max_bytes: int
+        maximum total size of the pickle files
+
+    """
+
+    def __init__(self, cache_dir, max_bytes=500*2**20):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        cache_dir: str
+        max_bytes: int
+        """
+        assert max_bytes > 0
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def get_default():
+        """
+        This method returns a SymbolicCache in the directory given by the
+        environment variable SCUMPY_CACHE_DIR, or None if that variable is
+        not set.
+
+        Returns
+        -------
+        SymbolicCache or None
+
+        """
+        cache_dir = os.environ.get("SCUMPY_CACHE_DIR")
+        if not cache_dir:
+            return None
+        max_mb = float(os.environ.get("SCUMPY_CACHE_MAX_MB", 500))
+        return SymbolicCache(cache_dir, max_bytes=int(max_mb*2**20))
+
+    @staticmethod
+    def get_key(kind, graph, conditioned_nds=None, time=None, **options):
+        """
+        This method returns the key (a hex string) under which a result of
+        type 'kind' calculated for 'graph' is stored.
+
+        Parameters
+        ----------
+        kind: str
+            name of the result, e.g., "cov_mat" or "gains"
+        graph: Graph or FBackGraph
+        conditioned_nds: None or list[str]
+        time: None or str or int
+        options: dict
+            any other arguments that the result depends on
+
+        Returns
+        -------
+        str
+
+        """
+        if conditioned_nds is None:
+            conditioned_nds = []
+        items = [kind,
+                 CACHE_FORMAT_VERSION,
+                 sp.__version__,
+                 list(graph.ord_nodes),
+                 sorted(graph.arrows),
+                 sorted(graph.amputated_arrows),
+                 sorted(getattr(graph, "fback_arrows", [])),
+                 sorted(conditioned_nds),
+                 repr(time),
+                 sorted(options.items())]
+        return hashlib.sha256(repr(items).encode()).hexdigest()
+
+    def get_path(self, key):
+        """
+        This method returns the path of the file that stores the result
+        with key 'key'.
+
+        Parameters
+        ----------
+        key: str
+
+        Returns
+        -------
+        str
+
+        """
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def load(self, key):
+        """
+        This method returns the result stored under key 'key', or None if
+        there is no such result.
+
+        Parameters
+        ----------
+        key: str
+
+        Returns
+        -------
+        object or None
+
+        """
+        path = self.get_path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError,
+                ImportError):
+            # corrupted or stale file (e.g., one that refers to a module or
+            # class that has been renamed or removed). Drop it and
+            # recalculate
+            os.remove(path)
+            return None
+        # the modification time is used as the last access time
+        os.utime(path)
+        return result
+
+    def save(self, key, result):
+        """
+        This method stores 'result' under key 'key', and then evicts the
+        least recently used files if the cache is too big.
+
+        Parameters
+        ----------
+        key: str
+        result: object
+            must be picklable
+
+        Returns
+        -------
+        None
+
+        """
+        path = self.get_path(key)
+        tempo_path = path + "." + str(os.getpid()) + ".tmp"
+        with open(tempo_path, "wb") as f:
+            pickle.dump(result, f)
+        # atomic, so concurrent readers never see a partial file
+        os.replace(tempo_path, path)
+        self.evict()
+
+    def evict(self):
+        """
+        This method deletes the least recently used files until the total
+        size of the cache is at most self.max_bytes.
+
+        Returns
+        -------
+        None
+
+        """
+        entries = []
+        total = 0
+        for fname in os.listdir(self.cache_dir):
+            if not fname.endswith(".pkl"):
+                continue
+            path = os.path.join(self.cache_dir, fname)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        This method deletes all the files in the cache.
+
+        Returns
+        -------
+        None
+
+        """
+        for fname in os.listdir(self.cache_dir):
+            if fname.endswith(".pkl"):
+                os.remove(os.path.join(self.cache_dir, fname))
+
+
+if __name__ == "__main__":
+    from time import time
+    from CovMatCalculator import *
+    from GainsCalculator import *
+
+    def main():
+        cache = SymbolicCache("scumpy_cache")
+        cache.clear()
+        path = 'dot_atlas/good_bad_trols_G1.dot'
+        graph = Graph(path)
+        for run in ["first", "second"]:
+            start = time()
+            cal = CovMatCalculator(graph, conditioned_nds=["Z"], cache=cache)
+            cal.calculate_cov_mat()
+            cal = GainsCalculator(graph, cache=cache)
+            cal.calculate_gains()
+            print(run, "run: %.4f s" % (time() - start))
+        print(cal.alpha_mat)
+
+    main()
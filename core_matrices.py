@@ -1,4 +1,6 @@
 import sympy as sp
+import numpy as np
+import re
 from itertools import product
 from latexify import *
 
@@ -6,7 +8,10 @@ from latexify import *
 
 The functions in this file return various core (i.e., fundamental for 
 scumpy) matrices of the type sp.Matrix. The entries of those matrices are 
-sp.Symbol instances.
+sp.Symbol instances. The matrices are memoized internally, and 
+get_sb_info() returns the kind, row, col and time of a symbol from its 
+name. Both memos are bounded, so they do not grow forever in long-running 
+processes that handle many graphs.
 
 The names of the entries of the matrices created by this file, are as follows:
 
@@ -31,10 +36,260 @@ The names of the entries of the matrices created by this file, are as follows:
 """
 
 
+# cache of the matrices returned by make_sb_mat(),
+# keyed by (mat_str, dim, mat_type). At most SB_MAT_CACHE_MAX_SIZE
+# matrices are kept, the least recently used are dropped first
+SB_MAT_CACHE = {}
+SB_MAT_CACHE_MAX_SIZE = 256
+
+# memo of get_sb_info(). symbol -> (kind, row, col, time). At most
+# SB_INFO_MAX_SIZE symbols are kept, the least recently used are dropped
+# first
+SB_INFO = {}
+SB_INFO_MAX_SIZE = 2**16
+
+# used by get_sb_info() to parse the name of a symbol
+SB_NAME_PATTERNS = [
+    (re.compile(r"^(sigma_eps|sigma_nd)_(\d+)$"), None),
+    (re.compile(r"^(alpha|beta)_(\d+)_L_(\d+)$"), None),
+    (re.compile(r"^(pder)_(\d+)_wrt_(\d+)$"), None),
+    (re.compile(r"^(ee|rho|err|K|G)_(\d+)_(\d+)$"), None),
+    (re.compile(r"^(cov)_(\d+)_(\d+)$"), None),
+    (re.compile(r"^(cov)_one_(\d+)_(\d+)$"), "one"),
+    (re.compile(r"^(cov)_n_plus_one_(\d+)_(\d+)$"), "n_plus_one"),
+    (re.compile(r"^(cov|cov2times|d_cov2times)_n_(\d+)_(\d+)$"), "n"),
+    (re.compile(r"^(cov|cov2times|d_cov2times)_n(\d+)_(\d+)_(\d+)$"), int)]
+
+
+def put_in_bounded_cache(cache, key, value, max_size):
+    """
+    This method stores 'value' under 'key' in the dictionary 'cache',
+    first dropping the least recently used entries if the cache holds
+    'max_size' entries. Dictionaries keep their insertion order,
+    so the least recently used entry is the first one, provided that
+    each hit is moved to the end (see get_from_bounded_cache()).
+
+    Parameters
+    ----------
+    cache: dict
+    key: object
+    value: object
+    max_size: int
+
+    Returns
+    -------
+    None
+
+    """
+    while len(cache) >= max_size:
+        del cache[next(iter(cache))]
+    cache[key] = value
+
+
+def get_from_bounded_cache(cache, key):
+    """
+    This method returns cache[key], or None if key is not in 'cache'. A
+    hit is moved to the end of the dictionary. See put_in_bounded_cache()
+
+    Parameters
+    ----------
+    cache: dict
+    key: object
+
+    Returns
+    -------
+    object or None
+
+    """
+    value = cache.pop(key, None)
+    if value is not None:
+        cache[key] = value
+    return value
+
+
+def make_sb(mat_str, row, col=None):
+    """
+    This method returns the symbol sp.Symbol(mat_str % (row, col)) (or
+    sp.Symbol(mat_str % row) if col is None).
+
+    Parameters
+    ----------
+    mat_str: str
+        for example, "alpha_%d_L_%d"
+    row: int
+    col: int or None
+
+    Returns
+    -------
+    sp.Symbol
+
+    """
+    if col is None:
+        return sp.Symbol(mat_str % row)
+    return sp.Symbol(mat_str % (row, col))
+
+
+def get_sb_info(sb):
+    """
+    This method returns the tuple (kind, row, col, time) for a symbol
+    created by this file, for example ("alpha", 2, 0, None) for alpha_2_L_0,
+    ("cov", 0, 1, 5) for cov_n5_0_1, and ("beta", 1, 1, None) for
+    beta_1_L_1. It returns None if sb is not one of the symbols named in
+    the docstring of this file.
+
+    The name of each symbol is parsed only once, and the result is
+    memoized in SB_INFO, so repeated lookups are O(1).
+
+    Parameters
+    ----------
+    sb: sp.Symbol
+
+    Returns
+    -------
+    tuple[str, int, int, None or str or int] or None
+
+    """
+    info = get_from_bounded_cache(SB_INFO, sb)
+    if info is not None:
+        return info
+    if not isinstance(sb, sp.Symbol):
+        return None
+    for pattern, time in SB_NAME_PATTERNS:
+        match = pattern.match(sb.name)
+        if match is None:
+            continue
+        groups = match.groups()
+        kind = groups[0]
+        if time is int:
+            time = int(groups[1])
+            groups = groups[1:]
+        indices = [int(x) for x in groups[1:]]
+        row, col = indices[0], indices[-1]
+        info = (kind, row, col, time)
+        put_in_bounded_cache(SB_INFO, sb, info, SB_INFO_MAX_SIZE)
+        return info
+    return None
+
+
+# dtype of the structured numpy arrays returned by make_sb_records()
+SB_RECORD_DTYPE = np.dtype([("kind", "U16"),
+                            ("row", np.int64),
+                            ("col", np.int64),
+                            ("lhs", object),
+                            ("expr", object),
+                            ("value", np.float64)])
+
+
+def get_sb_value(x):
+    """
+    This method returns float(x) if the sympy expression x is a number,
+    and np.nan otherwise (for example, if x depends on covariances of
+    hidden nodes).
+
+    Parameters
+    ----------
+    x: sp.Expr
+
+    Returns
+    -------
+    float
+
+    """
+    if not getattr(x, "is_number", False):
+        return np.nan
+    try:
+        return float(x)
+    except TypeError:
+        # complex infinity, etc.
+        return np.nan
+
+
+def make_sb_records(eq_list):
+    """
+    This method returns a structured numpy array with one record per
+    equation lhs = expr in eq_list. The fields of each record are
+
+    kind, row, col: as returned by get_sb_info(lhs)
+    lhs: the left hand side, a sp.Symbol
+    expr: the right hand side, a sp.Expr
+    value: get_sb_value(expr)
+
+    Parameters
+    ----------
+    eq_list: list[sp.Eq]
+
+    Returns
+    -------
+    np.array of dtype SB_RECORD_DTYPE
+
+    """
+    records = np.empty(len(eq_list), dtype=SB_RECORD_DTYPE)
+    for i, eq in enumerate(eq_list):
+        lhs, expr = eq.args
+        kind, row, col, _ = get_sb_info(lhs)
+        records[i] = (kind, row, col, lhs, expr, get_sb_value(expr))
+    return records
+
+
+def xreplace_records(records, subs_dict, fields=("lhs", "expr")):
+    """
+    This method returns a copy of 'records' in which xreplace(subs_dict)
+    has been applied to the fields 'fields' (lhs and expr by default),
+    and the field value has been recalculated. kind, row and col are not
+    changed.
+
+    Each field is substituted with a single xreplace() of a sp.Tuple that
+    holds the whole column, instead of one xreplace() per record.
+
+    Parameters
+    ----------
+    records: np.array of dtype SB_RECORD_DTYPE
+    subs_dict: dict[sp.Symbol, sp.Expr]
+    fields: tuple[str]
+
+    Returns
+    -------
+    np.array of dtype SB_RECORD_DTYPE
+
+    """
+    records = records.copy()
+    for field in fields:
+        column = np.empty(len(records), dtype=object)
+        column[:] = sp.Tuple(*records[field]).xreplace(subs_dict).args
+        records[field] = column
+    records["value"] = np.frompyfunc(get_sb_value, 1, 1)(
+        records["expr"]).astype(float)
+    return records
+
+
+def get_eq_list_from_records(records):
+    """
+    This method is the inverse of make_sb_records(). It returns the list
+    of equations lhs = expr stored in 'records'.
+
+    Parameters
+    ----------
+    records: np.array of dtype SB_RECORD_DTYPE
+
+    Returns
+    -------
+    list[sp.Eq]
+
+    """
+    return [sp.Eq(lhs, expr) for lhs, expr in
+            zip(records["lhs"], records["expr"])]
+
+
 def make_sb_mat(dim, mat_str, mat_type="general"):
     """
     This method returns a symbolic (sb) matrix of type sp.Matrix.
 
+    The matrices are memoized in SB_MAT_CACHE (as sp.ImmutableMatrix),
+    so each matrix is usually built only once per (mat_str, dim,
+    mat_type). The caller gets a new mutable copy of the memoized matrix,
+    whose entries (immutable symbols) are shared, so the memo is never
+    modified.
+
     Parameters
     ----------
     dim: int
@@ -51,31 +306,37 @@ def make_sb_mat(dim, mat_str, mat_type="general"):
     sp.Matrix
 
     """
+    key = (mat_str, dim, mat_type)
+    mat = get_from_bounded_cache(SB_MAT_CACHE, key)
+    if mat is not None:
+        return mat.as_mutable()
     rows = []
     for i in range(dim):
         col = []
         for j in range(dim):
             if mat_type == "general":
-                col.append(sp.Symbol(mat_str % (i, j)))
+                col.append(make_sb(mat_str, i, j))
             elif mat_type == "symmetric":
                 # we only use cov_mat[min(i,j), max(i,j)]
                 # because cov_mat[i, j] is symmetric
-                col.append(sp.Symbol(mat_str % (min(i, j), max(i, j))))
+                col.append(make_sb(mat_str, min(i, j), max(i, j)))
             elif mat_type == "strictly_lower_triangular":
                 if i > j:
-                    col.append(sp.Symbol(mat_str % (i, j)))
+                    col.append(make_sb(mat_str, i, j))
                 else:
                     col.append(0)
             elif mat_type == "diagonal":
                 if i == j:
-                    col.append(sp.Symbol(mat_str % i))
+                    col.append(make_sb(mat_str, i))
                 else:
                     col.append(0)
             else:
                 assert False
 
         rows.append(col)
-    return sp.Matrix(rows)
+    mat = sp.ImmutableMatrix(rows)
+    put_in_bounded_cache(SB_MAT_CACHE, key, mat, SB_MAT_CACHE_MAX_SIZE)
+    return mat.as_mutable()
 
 
 def sigma_eps_sb_mat(dim):
@@ -157,6 +418,94 @@ def beta_sb_mat(dim):
                         mat_type="general")
 
 
+def gains_sb_mat_from_arrows(graph, arrows, mat_str, lower_only=False,
+                             sparse=False):
+    """
+    This method returns a matrix of gains (of type sp.Matrix or
+    sp.SparseMatrix) with entry [row, col] equal to sp.Symbol(mat_str % (
+    row, col)) if there is an arrow col_nd->row_nd in 'arrows', and 0
+    otherwise. Only the symbols for the existing arrows are created.
+
+    Parameters
+    ----------
+    graph: Graph or FBackGraph
+    arrows: list[tuple[str, str]]
+    mat_str: str
+    lower_only: bool
+        if True, only entries with row > col are kept
+    sparse: bool
+        if True, a sp.SparseMatrix is returned
+
+    Returns
+    -------
+    sp.Matrix or sp.SparseMatrix
+
+    """
+    dim = graph.num_nds
+    nd_to_pos = {nd: pos for pos, nd in enumerate(graph.ord_nodes)}
+    entries = {}
+    for col_nd, row_nd in arrows:
+        row, col = nd_to_pos[row_nd], nd_to_pos[col_nd]
+        if lower_only and row <= col:
+            continue
+        entries[(row, col)] = make_sb(mat_str, row, col)
+    if sparse:
+        return sp.SparseMatrix(dim, dim, entries)
+    mat = sp.zeros(dim)
+    for (row, col), sb in entries.items():
+        mat[row, col] = sb
+    return mat
+
+
+def alpha_sb_mat_from_graph(graph, sparse=False):
+    """
+    This method returns the same matrix as
+
+    set_to_zero_gains_without_arrows(graph, alpha_sb_mat(graph.num_nds))
+
+    but it builds it directly from graph.arrows, instead of creating a
+    symbol for every strictly lower triangular entry and then zeroing the
+    ones without an arrow.
+
+    Parameters
+    ----------
+    graph: Graph
+    sparse: bool
+        if True, a sp.SparseMatrix is returned
+
+    Returns
+    -------
+    sp.Matrix or sp.SparseMatrix
+
+    """
+    return gains_sb_mat_from_arrows(graph, graph.arrows, "alpha_%d_L_%d",
+                                    lower_only=True, sparse=sparse)
+
+
+def beta_sb_mat_from_graph(graph, sparse=False):
+    """
+    This method returns the same matrix as
+
+    set_to_zero_fback_gains_without_arrows(graph, beta_sb_mat(
+    graph.num_nds))
+
+    but it builds it directly from graph.fback_arrows.
+
+    Parameters
+    ----------
+    graph: FBackGraph
+    sparse: bool
+        if True, a sp.SparseMatrix is returned
+
+    Returns
+    -------
+    sp.Matrix or sp.SparseMatrix
+
+    """
+    return gains_sb_mat_from_arrows(graph, graph.fback_arrows,
+                                    "beta_%d_L_%d", sparse=sparse)
+
+
 def cov_sb_mat(dim, time=None):
     """
     This method returns the covariance matrix at time t, C^t (of type 
@@ -311,5 +660,10 @@ if __name__ == "__main__":
         print(rho_sb_mat(dim))
         print(jacobian_sb_mat(dim))
         print((sp.eye(dim) - alpha_sb_mat(dim)).inv())
+
+        from FBackGraph import FBackGraph
+        graph = FBackGraph('dot_atlas/fback-2node.dot')
+        print(alpha_sb_mat_from_graph(graph))
+        print(beta_sb_mat_from_graph(graph, sparse=True))
     main()
 
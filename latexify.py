@@ -3,7 +3,6 @@ import sympy as sp
 from itertools import product
 from core_matrices import *
 from numerical_subs import *
-from copy import deepcopy
 
 """
 
@@ -16,6 +15,9 @@ and lists (list[sp.Matrix]) in LaTeX
 
 """
 
+# cache of get_latex_subs_dict(), keyed by (tuple(graph.ord_nodes), time)
+LATEX_SUBS_CACHE = {}
+
 
 def round_expr(expr, num_digits):
     """
@@ -197,43 +199,30 @@ def latex_cov2times_str(row_nd, col_nd, time, delta=False):
     return latex_str
 
 
-def do_latex_subs(graph, x, time=None):
+def get_latex_subs_dict(graph, time=None):
     """
-    This method substitutes
-
-    sp.Symbol("sigma_eps_" + str(i))
-    sp.Symbol("sigma_" + str(i))
-    sp.Symbol("alpha_" + str(row) + "_L_" + str(col))
-    sp.Symbol("beta_" + str(row) + "_L_" + str(col))
-    sp.Symbol("cov_" + str(row) + "_" + str(col))
-    sp.Symbol("cov_one_" + str(row) + "_" + str(col))
-    sp.Symbol("cov_n_" + str(row) + "_" + str(col))
-    sp.Symbol("cov_n_plus_one_" + str(row) + "_" + str(col))
-    sp.Symbol("cov_n" + str(time) + "_" + str(row) + "_" + str(col))
-    sp.Symbol("cov2times_n" + str(row) + "_" + str(col))
-    sp.Symbol("cov2times_n" + str(time) + str(row) + "_" + str(col))
-    sp.Symbol("d_cov2times_n" + str(row) + "_" + str(col))
-    sp.Symbol("d_cov2times_n" + str(time) + str(row) + "_" + str(col))
-    sp.Symbol("ee_" + str(row) + "_" + str(col))
-    sp.Symbol("rho_" + str(row) + "_" + str(col))
-    sp.Symbol("pder_" + str(row) + "_wrt_" + str(col))
-    sp.Symbol("G_" + str(row) + "_" + str(col))
-    sp.Symbol("err_" + str(row) + "_" + str(col))
+    This method returns the dictionary that maps each symbol that
+    do_latex_subs() substitutes (see its docstring) to its latex
+    counterpart, for the nodes graph.ord_nodes and the time 'time'.
 
-    by their latex counterparts. str(i), str(row) and str(col) are all
-    replaced by a node name from the list graph.ord_nodes
+    The dictionary only depends on graph.ord_nodes and time, so it is
+    built only once per (graph.ord_nodes, time) and stored in
+    LATEX_SUBS_CACHE.
 
     Parameters
     ----------
-    graph: Graph
-    x: sp.Symbol or sp.Matrix or sp.Eq
+    graph: Graph or FBackGraph
     time: None or str or int
 
     Returns
     -------
-    type(x)
+    dict[sp.Symbol, sp.Symbol]
 
     """
+    key = (tuple(graph.ord_nodes), time)
+    if key in LATEX_SUBS_CACHE:
+        return LATEX_SUBS_CACHE[key]
+    subs_dict = {}
     num_nds = graph.num_nds
     for i in range(num_nds):
         nd = graph.ord_nodes[i]
@@ -241,11 +230,11 @@ def do_latex_subs(graph, x, time=None):
         latex_str = r"\sigma_{\underline{\epsilon}" + \
                           r"_{\underline{" + nd + r"}}}"
         sb_str = "sigma_eps_" + str(i)
-        x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+        subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
         latex_str = r"\sigma_{\underline{" + nd + r"}}"
         sb_str = "sigma_nd_" + str(i)
-        x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+        subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
     for row, col in product(range(num_nds), range(num_nds)):
         row_nd = graph.ord_nodes[row]
@@ -254,35 +243,33 @@ def do_latex_subs(graph, x, time=None):
         latex_str = r"\alpha_{\underline{" + row_nd + \
                     r"}|\underline{" + col_nd + r"}}"
         sb_str = "alpha_" + str(row) + "_L_" + str(col)
-        x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+        subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
         latex_str = r"\beta_{\underline{" + row_nd + \
                     r"}|\underline{" + col_nd + r"}}"
         sb_str = "beta_" + str(row) + "_L_" + str(col)
-        x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+        subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
         for time0 in [None, "one", "n", "n_plus_one"]:
             latex_str = latex_cov_str(row_nd, col_nd, time0)
             sb_str = sb_cov_str(row, col, time0)
-            x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+            subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
         for delta in [True, False]:
             latex_str = latex_cov2times_str(row_nd, col_nd, time="n",
                                             delta=delta)
             sb_str = sb_cov2times_str(row, col, time="n",
                                       delta=delta)
-            x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+            subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
-        # print("vvbgh", time)
         if isinstance(time, int):
             latex_str = latex_cov_str(row_nd, col_nd, time)
             sb_str = sb_cov_str(row, col, time)
-            # print("vvbg", sb_str, latex_str)
-            x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+            subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
             latex_str = latex_cov2times_str(row_nd, col_nd, time)
             sb_str = sb_cov2times_str(row, col, time)
-            x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+            subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
         if row_nd == col_nd:
             latex_str = r"\sigma^2_{\underline{\epsilon}" + \
@@ -292,29 +279,74 @@ def do_latex_subs(graph, x, time=None):
                     row_nd + r"},\underline{\epsilon}_\underline{" + \
                     col_nd + r"}\right\rangle"
         sb_str = "ee_" + str(row) + "_" + str(col)
-        x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+        subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
         latex_str = r"\rho_{\underline{" + row_nd + \
                     r"},\underline{" + col_nd + r"}}"
         sb_str = "rho_" + str(row) + "_" + str(col)
-        x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+        subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
         latex_str = r"\frac{\partial\underline{" + row_nd + \
                      r"}}{\partial\underline{" + col_nd + r"}}"
         sb_str = "pder_" + str(row) + "_wrt_" + str(col)
-        x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+        subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
         latex_str = r"G_{\underline{" + row_nd + \
                     r"},\underline{" + col_nd + r"}}"
         sb_str = "G_" + str(row) + "_" + str(col)
-        x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+        subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
 
         latex_str = r"err_{\underline{" + row_nd + \
                     r"},\underline{" + col_nd + r"}}"
         sb_str = "err_" + str(row) + "_" + str(col)
-        x = x.subs(sp.Symbol(sb_str), sp.Symbol(latex_str))
+        subs_dict[sp.Symbol(sb_str)] = sp.Symbol(latex_str)
+
+    LATEX_SUBS_CACHE[key] = subs_dict
+    return subs_dict
+
+
+def do_latex_subs(graph, x, time=None):
+    """
+    This method substitutes
+
+    sp.Symbol("sigma_eps_" + str(i))
+    sp.Symbol("sigma_" + str(i))
+    sp.Symbol("alpha_" + str(row) + "_L_" + str(col))
+    sp.Symbol("beta_" + str(row) + "_L_" + str(col))
+    sp.Symbol("cov_" + str(row) + "_" + str(col))
+    sp.Symbol("cov_one_" + str(row) + "_" + str(col))
+    sp.Symbol("cov_n_" + str(row) + "_" + str(col))
+    sp.Symbol("cov_n_plus_one_" + str(row) + "_" + str(col))
+    sp.Symbol("cov_n" + str(time) + "_" + str(row) + "_" + str(col))
+    sp.Symbol("cov2times_n" + str(row) + "_" + str(col))
+    sp.Symbol("cov2times_n" + str(time) + str(row) + "_" + str(col))
+    sp.Symbol("d_cov2times_n" + str(row) + "_" + str(col))
+    sp.Symbol("d_cov2times_n" + str(time) + str(row) + "_" + str(col))
+    sp.Symbol("ee_" + str(row) + "_" + str(col))
+    sp.Symbol("rho_" + str(row) + "_" + str(col))
+    sp.Symbol("pder_" + str(row) + "_wrt_" + str(col))
+    sp.Symbol("G_" + str(row) + "_" + str(col))
+    sp.Symbol("err_" + str(row) + "_" + str(col))
+
+    by their latex counterparts. str(i), str(row) and str(col) are all
+    replaced by a node name from the list graph.ord_nodes
+
+    All the substitutions are done at once, with a single xreplace() of
+    the dictionary returned by get_latex_subs_dict(), so x is traversed
+    only once.
+
+    Parameters
+    ----------
+    graph: Graph
+    x: sp.Symbol or sp.Matrix or sp.Eq
+    time: None or str or int
+
+    Returns
+    -------
+    type(x)
 
-    return x
+    """
+    return x.xreplace(get_latex_subs_dict(graph, time))
 
 
 def print_all_core_mats_after_latex_subs(graph):
@@ -447,26 +479,16 @@ def print_list_sb(eq_list, graph, verbose=False,
     assert len(eq_list) == len(comment_list)
     if prefix_str is None:
         prefix_str = ""
-    str0 = ""
-    x = eq_list
-    x_copy = deepcopy(x)
-    # print("lllj", type(x))
     if verbose:
-        for i in range(len(x)):
-            print(prefix_str + " " + str(x[i]) + "\t" + comment_list[i] + "\n")
-    str0 += r"\begin{array}{l}" + "\n"
-    for i in range(len(x)):
-        if rounded:
-            x_copy[i] = round_expr(x_copy[i], 6)
-        x_copy[i] = do_latex_subs(graph, x_copy[i], time)
-        x_copy[i] = sp.latex(x_copy[i])
-        if  len(prefix_str) != 0:
-            str0 += r"\text{" + prefix_str + r" } "
-        str0 += x_copy[i] + r"\quad" + comment_list[i] + "\n" + r"\\"\
-                       + "\n"
-    str0 = str0[:-3]
-    str0 += r"\end{array}"
-    # print("lluj", str0)
+        for i in range(len(eq_list)):
+            print(prefix_str + " " + str(eq_list[i]) + "\t" +
+                  comment_list[i] + "\n")
+    str0 = r"\begin{array}{l}" + "\n"
+    str0 += ("\n" + r"\\" + "\n").join(
+        iter_latex_lines(eq_list, graph, time=time,
+                         comment_list=comment_list, rounded=rounded,
+                         prefix_str=prefix_str))
+    str0 += "\n" + r"\end{array}"
     if verbose:
         print("\n", str0)
     # this return prints nothing on the console, but, if
@@ -475,6 +497,45 @@ def print_list_sb(eq_list, graph, verbose=False,
     return sp.Symbol(str0)
 
 
+def iter_latex_lines(eq_list, graph, time=None, comment_list=None,
+                     rounded=True, prefix_str=None):
+    """
+    This method is a generator that yields, one at a time, the latex
+    lines that print_list_sb() puts inside its LaTeX array, one line per
+    item of eq_list. Items are passed through do_latex_subs() and
+    printed one at a time, so eq_list is not deep-copied, and a long list
+    can be rendered (e.g., written to a file) line by line.
+
+    Parameters
+    ----------
+    eq_list: list[sp.Eq]
+    graph: Graph or FBackGraph
+    time: None or str or int
+    comment_list: list[str]
+        This List[str] should be of the same length as eq_list
+    rounded: bool
+        This is True iff the numerical parts of the answer are to be rounded.
+    prefix_str: str
+        prefix string to start each line printed.
+
+    Returns
+    -------
+    generator[str]
+
+    """
+    if comment_list is None:
+        comment_list = [""]*len(eq_list)
+    assert len(eq_list) == len(comment_list)
+    for eq, comment in zip(eq_list, comment_list):
+        if rounded:
+            eq = round_expr(eq, 6)
+        line = ""
+        if prefix_str:
+            line += r"\text{" + prefix_str + r" } "
+        yield line + sp.latex(do_latex_subs(graph, eq, time)) + \
+            r"\quad" + comment
+
+
 if __name__ == "__main__":
 
     def main():
@@ -490,4 +551,11 @@ if __name__ == "__main__":
         graph = Graph(path)
         print_all_core_mats_after_latex_subs(graph)
 
+        # streaming render of a long list, one line at a time
+        dim = graph.num_nds
+        eq_list = create_eq_list_from_matrix(
+            cov_sb_mat(dim) - ee_sb_mat(dim), "G", graph, time=None)
+        for line in iter_latex_lines(eq_list, graph, prefix_str="G:"):
+            print(line)
+
     main()
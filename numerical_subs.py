@@ -8,6 +8,12 @@ from itertools import product
 The functions in this file return their input x after performing some 
 numerical substitutions of some of the symbols in x. x is usually a sp.Matrix.
 
+Each function builds a single substitution dictionary {symbol: number} 
+and applies it to x with one call to x.xreplace(), so x is traversed only 
+once, no matter how many symbols are substituted. The numbers are sympy 
+numbers (sp.S.Zero, sp.S.One) because, if x is itself a substituted 
+symbol, xreplace() returns the value in the dictionary as is.
+
 """
 
 
@@ -26,10 +32,11 @@ def set_to_one_sigma_eps_mat(graph, x):
 
     """
     num_nds = graph.num_nds
+    subs_dict = {}
     for i in range(num_nds):
         sigma_eps_sb = "sigma_eps_" + str(i)
-        x = x.subs(sp.Symbol(sigma_eps_sb), 1)
-    return x
+        subs_dict[sp.Symbol(sigma_eps_sb)] = sp.S.One
+    return x.xreplace(subs_dict)
 
 
 def set_to_zero_gains_without_arrows(graph, x):
@@ -47,14 +54,16 @@ def set_to_zero_gains_without_arrows(graph, x):
     type(x)
     """
     dim = graph.num_nds
+    arrows = set(graph.arrows)
+    subs_dict = {}
     for row, col in product(range(dim), range(dim)):
         row_nd = graph.ord_nodes[row]
         col_nd = graph.ord_nodes[col]
 
-        if row > col and (col_nd, row_nd) not in graph.arrows:
+        if row > col and (col_nd, row_nd) not in arrows:
             alpha_sb = "alpha_" + str(row) + "_L_" + str(col)
-            x = x.subs(sp.Symbol(alpha_sb), 0)
-    return x
+            subs_dict[sp.Symbol(alpha_sb)] = sp.S.Zero
+    return x.xreplace(subs_dict)
 
 
 def set_to_zero_fback_gains_without_arrows(graph, x):
@@ -72,14 +81,16 @@ def set_to_zero_fback_gains_without_arrows(graph, x):
     type(x)
     """
     dim = graph.num_nds
+    fback_arrows = set(graph.fback_arrows)
+    subs_dict = {}
     for row, col in product(range(dim), range(dim)):
         row_nd = graph.ord_nodes[row]
         col_nd = graph.ord_nodes[col]
 
-        if (col_nd, row_nd) not in graph.fback_arrows:
+        if (col_nd, row_nd) not in fback_arrows:
             beta_sb = "beta_" + str(row) + "_L_" + str(col)
-            x = x.subs(sp.Symbol(beta_sb), 0)
-    return x
+            subs_dict[sp.Symbol(beta_sb)] = sp.S.Zero
+    return x.xreplace(subs_dict)
 
 
 if __name__ == "__main__":
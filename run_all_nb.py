@@ -7,8 +7,13 @@ import os
 This script tries to run all jupyter notebooks in the jupyter_notebooks 
 folder. The notebooks are executed but not saved (i.e., overwritten). 
 
+Symbolic results are cached on disk (see SymbolicCache.py) in the folder 
+given by the environment variable SCUMPY_CACHE_DIR, which defaults to 
+scumpy_cache. Hence, every run after the first one is much faster.
+
 '''
 
+os.environ.setdefault('SCUMPY_CACHE_DIR', os.path.abspath('scumpy_cache'))
 dir_name = 'jupyter_notebooks'
 for fname in os.listdir(dir_name):
     if fname[-6:] == '.ipynb':  # and fname[-12:] == 'native.ipynb':
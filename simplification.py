@@ -0,0 +1,234 @@
+import signal
+import threading
+import sympy as sp
+
+"""
+
+This file contains the function simplify_expr(), which the calculators
+(CovMatCalculator, FBackCovMatCalculator, FBackGainsCalculator) use
+instead of calling sp.simplify() or sp.factor() directly, so that the
+amount of simplification can be chosen by a policy.
+
+The policies, from cheapest to most expensive, are
+
+"none": the expression is returned as is
+"cancel": sp.cancel(), i.e., the expression is put in the form p/q,
+with p and q expanded polynomials without common factors
+"factor": sp.factor()
+"simplify": sp.simplify()
+
+Simplification is usually the slowest step of a symbolic calculation,
+and it is not needed if the results are only going to be evaluated
+numerically, so a pipeline can use "none" or "cancel" and be orders of
+magnitude faster, at the cost of less pretty output.
+
+The default policy, used by every calculator that is not given a policy
+explicitly, is stored in SIMP_DEFAULTS and can be changed with
+set_default_simp_policy(). A timeout (in seconds) for the simplification
+of each expression can also be set. If the simplification of an expression
+takes longer than that, the expression is returned unsimplified, and
+simplify_expr() says so, so that the calculators never store an
+unsimplified result in the SymbolicCache (whether a timeout fires depends
+on the load of the machine). Since only simplified results are cached,
+the timeout is not part of the cache keys. Timeouts use
+signal.setitimer(), so they are only enforced in the main thread of the
+process, and only on platforms that have it (not Windows).
+
+Wherever a timeout can be given, timeout="default" means the default
+timeout, and timeout=None means no timeout.
+
+"""
+
+SIMP_POLICIES = ["none", "cancel", "factor", "simplify"]
+
+SIMP_DEFAULTS = {"policy": "simplify", "timeout": None}
+
+
+class SimplificationTimeout(Exception):
+    """
+    This exception is raised by the SIGALRM handler when a simplification
+    exceeds its timeout. It is caught by call_with_timeout().
+
+    """
+    pass
+
+
+def set_default_simp_policy(policy, timeout=None):
+    """
+    This function sets the default simplification policy and timeout (in
+    seconds, None for no timeout) used by simplify_expr() and by the
+    calculators that are not given a policy explicitly.
+
+    Parameters
+    ----------
+    policy: str
+        an item of SIMP_POLICIES
+    timeout: None or float
+
+    Returns
+    -------
+    None
+
+    """
+    assert policy in SIMP_POLICIES, policy
+    assert timeout is None or timeout > 0
+    SIMP_DEFAULTS["policy"] = policy
+    SIMP_DEFAULTS["timeout"] = timeout
+
+
+def get_default_simp_policy():
+    """
+    This function returns the default simplification policy and timeout.
+
+    Returns
+    -------
+    str, None or float
+
+    """
+    return SIMP_DEFAULTS["policy"], SIMP_DEFAULTS["timeout"]
+
+
+def call_with_timeout(fun, expr, timeout):
+    """
+    This function returns (fun(expr), False), or (expr, True) if fun(
+    expr) takes more than 'timeout' seconds. The timeout is ignored if it
+    is None, or if this function is not called from the main thread,
+    or if signal.setitimer() is not available.
+
+    Parameters
+    ----------
+    fun: function
+    expr: sp.Basic
+    timeout: None or float
+
+    Returns
+    -------
+    sp.Basic, bool
+
+    """
+    if not timeout or not hasattr(signal, "setitimer") or \
+            threading.current_thread() is not threading.main_thread():
+        return fun(expr), False
+
+    def handler(signum, frame):
+        raise SimplificationTimeout()
+
+    old_handler = signal.signal(signal.SIGALRM, handler)
+    try:
+        # inside the try, in case the alarm fires before fun is called
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        return fun(expr), False
+    except SimplificationTimeout:
+        return expr, True
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old_handler)
+
+
+def simplify_expr(expr, policy=None, timeout="default",
+                  max_policy="simplify"):
+    """
+    This function simplifies 'expr' according to the policy 'policy',
+    but never more than 'max_policy'. For example, a calculator that used
+    to call sp.factor() calls this function with max_policy="factor",
+    so that the default policy "simplify" does not change its output.
+
+    If expr is a matrix, each entry is simplified separately (so the
+    timeout applies to each entry).
+
+    The second item returned is True iff the simplification of expr,
+    or of some of its entries, timed out. Those parts of expr are
+    returned unsimplified.
+
+    Parameters
+    ----------
+    expr: sp.Expr or sp.Eq or sp.Tuple or sp.Matrix
+    policy: None or str
+        an item of SIMP_POLICIES. If None, SIMP_DEFAULTS["policy"] is used.
+    timeout: "default" or None or float
+        timeout in seconds for each expression. If "default",
+        SIMP_DEFAULTS["timeout"] is used. If None, there is no timeout.
+    max_policy: str
+
+    Returns
+    -------
+    type(expr), bool
+
+    """
+    if policy is None:
+        policy = SIMP_DEFAULTS["policy"]
+    if timeout == "default":
+        timeout = SIMP_DEFAULTS["timeout"]
+    assert timeout is None or timeout > 0, timeout
+    assert policy in SIMP_POLICIES, policy
+    assert max_policy in SIMP_POLICIES, max_policy
+    policy = SIMP_POLICIES[min(SIMP_POLICIES.index(policy),
+                               SIMP_POLICIES.index(max_policy))]
+    if policy == "none":
+        return expr, False
+    if isinstance(expr, sp.MatrixBase):
+        results = [simplify_expr(x, policy=policy, timeout=timeout)
+                   for x in expr]
+        return expr.__class__(expr.rows, expr.cols,
+                              [x for x, _ in results]), \
+            any(timed_out for _, timed_out in results)
+    if policy == "cancel" and isinstance(expr, (sp.Eq, sp.Tuple)):
+        # sp.cancel() does not always reach the sides of an equation
+        results = [simplify_expr(arg, policy=policy, timeout=timeout)
+                   for arg in expr.args]
+        return expr.func(*[arg for arg, _ in results]), \
+            any(timed_out for _, timed_out in results)
+    fun = {"cancel": sp.cancel,
+           "factor": sp.factor,
+           "simplify": sp.simplify}[policy]
+    return call_with_timeout(fun, expr, timeout)
+
+
+if __name__ == "__main__":
+    import os
+    from time import time
+    from CovMatCalculator import *
+    from FBackGainsCalculator import *
+
+    def main():
+        # benchmark of each policy on every DAG in dot_atlas
+        totals = {policy: 0 for policy in SIMP_POLICIES}
+        for fname in sorted(os.listdir('dot_atlas')):
+            if fname[-4:] != '.dot':
+                continue
+            with open('dot_atlas/' + fname) as f:
+                if "green" in f.read():
+                    # has feedback loops
+                    continue
+            graph = Graph('dot_atlas/' + fname)
+            line = fname
+            for policy in SIMP_POLICIES:
+                start = time()
+                cal = CovMatCalculator(graph, conditioned_nds=None,
+                                       simp_policy=policy)
+                cal.calculate_cov_mat()
+                seconds = time() - start
+                totals[policy] += seconds
+                line += "  %s: %.3f s" % (policy, seconds)
+            print(line)
+        print("totals:", {policy: round(seconds, 3) for
+                          policy, seconds in totals.items()})
+
+        graph = FBackGraph('dot_atlas/fback-2node.dot')
+        for policy in SIMP_POLICIES:
+            start = time()
+            cal = FBackGainsCalculator(graph, simp_policy=policy)
+            cal.calculate_gains()
+            print("fback-2node", policy, "%.3f s" % (time() - start))
+            print(cal.alpha_list)
+
+        # per-expression timeout
+        x, y = sp.symbols("x y")
+        expr = sum((x + k*y)**(k % 5)/(x - k) for k in range(1, 40))
+        start = time()
+        result, timed_out = simplify_expr(expr, policy="simplify",
+                                          timeout=.5)
+        print("timeout=.5 s: %.3f s," % (time() - start),
+              "timed_out=", timed_out, "unchanged=", result == expr)
+
+    main()